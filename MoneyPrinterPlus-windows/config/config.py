@@ -21,28 +21,46 @@
 #
 #
 
+import copy
+import logging
 import os
 import shutil
-import streamlit as st
+import orjson
 import yaml
 import re
+from collections import deque
+from pathlib import Path
+from types import MappingProxyType
+
+from tools.file_utils import save_yaml
+
+# 优先使用 libyaml 的 C 实现，未编译 libyaml 时回退到纯 Python 实现
+yaml_loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+logger = logging.getLogger(__name__)
+
+_env_loaded = False
+
+
+def _ensure_env_loaded():
+    # Load environment variables from .env file, 只在配置文件引用了环境变量时执行一次
+    global _env_loaded
+    if _env_loaded:
+        return
+    _env_loaded = True
+    try:
+        from dotenv import load_dotenv
+        # Load .env file from project root
+        env_file = script_dir.parent.parent / '.env'
+        if env_file.is_file():
+            load_dotenv(env_file)
+            logger.debug("Loaded environment variables from %s", env_file)
+        else:
+            logger.debug(".env file not found, using system environment variables only")
+    except ImportError:
+        logger.debug("python-dotenv not installed, .env file will not be loaded automatically. "
+                     "Install with: pip install python-dotenv")
 
-from tools.file_utils import read_yaml, save_yaml
-
-# Load environment variables from .env file
-try:
-    from dotenv import load_dotenv
-    # Load .env file from project root
-    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    env_file = os.path.join(project_root, '.env')
-    if os.path.exists(env_file):
-        load_dotenv(env_file)
-        print(f"✅ Loaded environment variables from {env_file}")
-    else:
-        print("⚠️  .env file not found, using system environment variables only")
-except ImportError:
-    print("⚠️  python-dotenv not installed, .env file will not be loaded automatically")
-    print("   Install with: pip install python-dotenv")
 
 app_title = "AI工具箱"
 
@@ -70,176 +88,184 @@ GPT_soVITS_languages = {
 audio_types = {'remote': "云服务", 'local': "本地模型"}
 languages = {'zh-CN': "简体中文", 'en': "english", 'zh-TW': "繁體中文"}
 audio_languages = {'zh-CN': "中文", 'en-US': "english"}
-audio_voices_tencent = {
-    "zh-CN": {
-        "602003": "爱小悠(女)",  # Default voice - Best quality but only for text <150 chars
-        "501001": "智兰(女)",     # Supports long text (>150 chars) and Chinese+English
-        "501002": "智菊(女)",     # Supports long text (>150 chars) and Chinese+English
-        "501004": "月华(女)",
-        "502001": "智小柔(女)",
-        "502003": "智小敏(女)",
-        "502004": "智小满(女)",
-        "501000": "智斌(男)",
-        "501003": "智宇(男)",
-        "501005": "飞镜(男)",
-        "501006": "千嶂(男)",
-        "501007": "浅草(男)",
-        "502005": "智小解(男)",
-        "502006": "智小悟(男)",
-        "502007": "智小虎(童声)"
-    },
-    "en-US": {
-        "501008": "WeJames(男)",  # Supports long text and English
-        "501009": "WeWinny(女)"   # Supports long text and English
-    }
-}
-
-audio_voices_azure = {
-    "zh-CN": {
-        "zh-CN-XiaoxiaoNeural": "晓晓(女)",
-        "zh-CN-YunxiNeural": "云希(男)",
-        "zh-CN-YunjianNeural": "云健(男)",
-        "zh-CN-XiaoyiNeural": "晓伊(女)",
-        "zh-CN-YunyangNeural": "云扬(男)",
-        "zh-CN-XiaochenNeural": "晓晨(女)",
-        "zh-CN-XiaohanNeural": "晓涵(女)",
-        "zh-CN-XiaomengNeural": "晓萌(女)",
-        "zh-CN-XiaomoNeural": "晓墨(女)",
-        "zh-CN-XiaoqiuNeural": "晓秋(女)",
-        "zh-CN-XiaoruiNeural": "晓睿(女)",
-        "zh-CN-XiaoshuangNeural": "晓双(女,儿童)",
-        "zh-CN-XiaoyanNeural": "晓颜(女)",
-        "zh-CN-XiaoyouNeural": "晓悠(女,儿童)",
-        "zh-CN-XiaozhenNeura": "晓珍(女)",
-        "zh-CN-YunfengNeural": "云峰(男)",
-        "zh-CN-YunhaoNeural": "云浩(男)",
-        "zh-CN-YunxiaNeural": "云夏(男)",
-        "zh-CN-YunyeNeural": "云野(男)",
-        "zh-CN-YunzeNeural": "云泽(男)",
-        "zh-CN-XiaochenMultilingualNeural": "晓晨(女),多语言",
-        "zh-CN-XiaorouNeural": "晓蓉(女)",
-        "zh-CN-XiaoxiaoDialectsNeural": "晓晓(女),方言",
-        "zh-CN-XiaoxiaoMultilingualNeural": "晓晓(女),多语言",
-        "zh-CN-XiaoyuMultilingualNeural": "晓雨(女),多语言",
-        "zh-CN-YunjieNeural": "云杰(男)",
-        "zh-CN-YunyiMultilingualNeural": "云逸(男),多语言"
-    },
-    "en-US": {
-        "en-US-AvaMultilingualNeural": "Ava(female)",
-        "en-US-AndrewNeural": "Andrew(male)",
-        "en-US-EmmaNeural": "Emma(female)",
-        "en-US-BrianNeural": "Brian(male)",
-        "en-US-JennyNeural": "Jenny(female)",
-        "en-US-GuyNeural": "Guy(male)",
-        "en-US-AriaNeural": "Aria(female)",
-        "en-US-DavisNeural": "Davis(male)",
-        "en-US-JaneNeural": "Jane(female)",
-        "en-US-JasonNeural": "Jason(male)",
-        "en-US-SaraNeural": "Sara(female)",
-        "en-US-TonyNeural": "Tony(male)",
-        "en-US-NancyNeural": "Nancy(female)",
-        "en-US-AmberNeural": "Amber(female)",
-        "en-US-AnaNeural": "Ana(female),child",
-        "en-US-AshleyNeural": "Ashley(female)",
-        "en-US-BrandonNeural": "Brandon(male)",
-        "en-US-ChristopherNeural": "Christopher(male)",
-        "en-US-CoraNeural": "Cora(female)",
-        "en-US-ElizabethNeural": "Elizabeth(female)",
-        "en-US-EricNeural": "Eric(male)",
-        "en-US-JacobNeural": "Jacob(male)",
-        "en-US-JennyMultilingualNeural": "Jenny(female),multilingual",
-        "en-US-MichelleNeural": "Michelle(female)",
-        "en-US-MonicaNeural": "Monica(female)",
-        "en-US-RogerNeural": "Roger(male)",
-        "en-US-RyanMultilingualNeural": "Ryan(male),multilingual",
-        "en-US-SteffanNeural": "Steffan(male)",
-        "en-US-AndrewMultilingualNeura": "Andrew(male),multilingual",
-        "en-US-BlueNeural": "Blue(neural)",
-        "en-US-BrianMultilingualNeural": "Brian(male),multilingual",
-        "en-US-EmmaMultilingualNeural": "Emma(female),multilingual",
-        "en-US-AlloyMultilingualNeural": "Alloy(male),multilingual",
-        "en-US-EchoMultilingualNeural": "Echo(male),multilingual",
-        "en-US-FableMultilingualNeural": "Fable(neural),multilingual",
-        "en-US-OnyxMultilingualNeural": "Onyx(male),multilingual",
-        "en-US-NovaMultilingualNeural": "Nova(female),multilingual",
-        "en-US-ShimmerMultilingualNeural": "Shimmer(female),multilingual",
+def _build_audio_voices():
+    # 音色表只读，避免被运行时修改; 第一次访问时才构建
+    audio_voices_tencent = MappingProxyType({
+        "zh-CN": MappingProxyType({
+            "602003": "爱小悠(女)",  # Default voice - Best quality but only for text <150 chars
+            "501001": "智兰(女)",     # Supports long text (>150 chars) and Chinese+English
+            "501002": "智菊(女)",     # Supports long text (>150 chars) and Chinese+English
+            "501004": "月华(女)",
+            "502001": "智小柔(女)",
+            "502003": "智小敏(女)",
+            "502004": "智小满(女)",
+            "501000": "智斌(男)",
+            "501003": "智宇(男)",
+            "501005": "飞镜(男)",
+            "501006": "千嶂(男)",
+            "501007": "浅草(男)",
+            "502005": "智小解(男)",
+            "502006": "智小悟(男)",
+            "502007": "智小虎(童声)"
+        }),
+        "en-US": MappingProxyType({
+            "501008": "WeJames(男)",  # Supports long text and English
+            "501009": "WeWinny(女)"   # Supports long text and English
+        })
+    })
+
+    audio_voices_azure = MappingProxyType({
+        "zh-CN": MappingProxyType({
+            "zh-CN-XiaoxiaoNeural": "晓晓(女)",
+            "zh-CN-YunxiNeural": "云希(男)",
+            "zh-CN-YunjianNeural": "云健(男)",
+            "zh-CN-XiaoyiNeural": "晓伊(女)",
+            "zh-CN-YunyangNeural": "云扬(男)",
+            "zh-CN-XiaochenNeural": "晓晨(女)",
+            "zh-CN-XiaohanNeural": "晓涵(女)",
+            "zh-CN-XiaomengNeural": "晓萌(女)",
+            "zh-CN-XiaomoNeural": "晓墨(女)",
+            "zh-CN-XiaoqiuNeural": "晓秋(女)",
+            "zh-CN-XiaoruiNeural": "晓睿(女)",
+            "zh-CN-XiaoshuangNeural": "晓双(女,儿童)",
+            "zh-CN-XiaoyanNeural": "晓颜(女)",
+            "zh-CN-XiaoyouNeural": "晓悠(女,儿童)",
+            "zh-CN-XiaozhenNeura": "晓珍(女)",
+            "zh-CN-YunfengNeural": "云峰(男)",
+            "zh-CN-YunhaoNeural": "云浩(男)",
+            "zh-CN-YunxiaNeural": "云夏(男)",
+            "zh-CN-YunyeNeural": "云野(男)",
+            "zh-CN-YunzeNeural": "云泽(男)",
+            "zh-CN-XiaochenMultilingualNeural": "晓晨(女),多语言",
+            "zh-CN-XiaorouNeural": "晓蓉(女)",
+            "zh-CN-XiaoxiaoDialectsNeural": "晓晓(女),方言",
+            "zh-CN-XiaoxiaoMultilingualNeural": "晓晓(女),多语言",
+            "zh-CN-XiaoyuMultilingualNeural": "晓雨(女),多语言",
+            "zh-CN-YunjieNeural": "云杰(男)",
+            "zh-CN-YunyiMultilingualNeural": "云逸(男),多语言"
+        }),
+        "en-US": MappingProxyType({
+            "en-US-AvaMultilingualNeural": "Ava(female)",
+            "en-US-AndrewNeural": "Andrew(male)",
+            "en-US-EmmaNeural": "Emma(female)",
+            "en-US-BrianNeural": "Brian(male)",
+            "en-US-JennyNeural": "Jenny(female)",
+            "en-US-GuyNeural": "Guy(male)",
+            "en-US-AriaNeural": "Aria(female)",
+            "en-US-DavisNeural": "Davis(male)",
+            "en-US-JaneNeural": "Jane(female)",
+            "en-US-JasonNeural": "Jason(male)",
+            "en-US-SaraNeural": "Sara(female)",
+            "en-US-TonyNeural": "Tony(male)",
+            "en-US-NancyNeural": "Nancy(female)",
+            "en-US-AmberNeural": "Amber(female)",
+            "en-US-AnaNeural": "Ana(female),child",
+            "en-US-AshleyNeural": "Ashley(female)",
+            "en-US-BrandonNeural": "Brandon(male)",
+            "en-US-ChristopherNeural": "Christopher(male)",
+            "en-US-CoraNeural": "Cora(female)",
+            "en-US-ElizabethNeural": "Elizabeth(female)",
+            "en-US-EricNeural": "Eric(male)",
+            "en-US-JacobNeural": "Jacob(male)",
+            "en-US-JennyMultilingualNeural": "Jenny(female),multilingual",
+            "en-US-MichelleNeural": "Michelle(female)",
+            "en-US-MonicaNeural": "Monica(female)",
+            "en-US-RogerNeural": "Roger(male)",
+            "en-US-RyanMultilingualNeural": "Ryan(male),multilingual",
+            "en-US-SteffanNeural": "Steffan(male)",
+            "en-US-AndrewMultilingualNeura": "Andrew(male),multilingual",
+            "en-US-BlueNeural": "Blue(neural)",
+            "en-US-BrianMultilingualNeural": "Brian(male),multilingual",
+            "en-US-EmmaMultilingualNeural": "Emma(female),multilingual",
+            "en-US-AlloyMultilingualNeural": "Alloy(male),multilingual",
+            "en-US-EchoMultilingualNeural": "Echo(male),multilingual",
+            "en-US-FableMultilingualNeural": "Fable(neural),multilingual",
+            "en-US-OnyxMultilingualNeural": "Onyx(male),multilingual",
+            "en-US-NovaMultilingualNeural": "Nova(female),multilingual",
+            "en-US-ShimmerMultilingualNeural": "Shimmer(female),multilingual",
+        })
+    })
+
+    audio_voices_ali = MappingProxyType({
+        "zh-CN": MappingProxyType({
+            "zhixiaobai": "知小白(普通话女声)",
+            "zhixiaoxia": "知小夏(普通话女声)",
+            "zhixiaomei": "知小妹(普通话女声)",
+            "zhigui": "知柜(普通话女声)",
+            "zhishuo": "知硕(普通话男声)",
+            "aixia": "艾夏(普通话女声)",
+            "xiaoyun": "小云(标准女声)",
+            "xiaogang": "小刚(标准男声)",
+            "ruoxi": "若兮(温柔女声)",
+            "siqi": "思琪(温柔女声)",
+            "sijia": "思佳(标准女声)",
+            "sicheng": "思诚(标准男声)",
+            "aiqi": "艾琪(温柔女声)",
+            "aijia": "艾佳(标准女声)",
+            "aicheng": "艾诚(标准男声)",
+            "aida": "艾达(标准男声)",
+            "ninger": "宁儿(标准女声)",
+            "ruilin": "瑞琳(标准女声)",
+            "siyue": "思悦(温柔女声)",
+            "aiya": "艾雅(严厉女声)",
+            "aimei": "艾美(甜美女声)",
+            "aiyu": "艾雨(自然女声)",
+            "aiyue": "艾悦(温柔女声)",
+            "aijing": "艾静(严厉女声)",
+            "xiaomei": "小美(甜美女声)",
+            "aina": "艾娜(浙普女声)",
+            "yina": "依娜(浙普女声)",
+            "sijing": "思婧(严厉女声)",
+            "sitong": "思彤(儿童音)",
+            "xiaobei": "小北(萝莉女声)",
+            "aitong": "艾彤(儿童音)",
+            "aiwei": "艾薇(萝莉女声)",
+            "aibao": "艾宝(萝莉女声)"
+
+        }),
+        "en-US": MappingProxyType({
+            "zhixiaobai": "知小白(普通话女声)",
+            "zhixiaoxia": "知小夏(普通话女声)",
+            "zhixiaomei": "知小妹(普通话女声)",
+            "zhigui": "知柜(普通话女声)",
+            "zhishuo": "知硕(普通话男声)",
+            "aixia": "艾夏(普通话女声)",
+            "cally": "Cally(美式英文女声)",
+            "xiaoyun": "小云(标准女声)",
+            "xiaogang": "小刚(标准男声)",
+            "ruoxi": "若兮(温柔女声)",
+            "siqi": "思琪(温柔女声)",
+            "sijia": "思佳(标准女声)",
+            "sicheng": "思诚(标准男声)",
+            "aiqi": "艾琪(温柔女声)",
+            "aijia": "艾佳(标准女声)",
+            "aicheng": "艾诚(标准男声)",
+            "aida": "艾达(标准男声)",
+            "siyue": "思悦(温柔女声)",
+            "aiya": "艾雅(严厉女声)",
+            "aimei": "艾美(甜美女声)",
+            "aiyu": "艾雨(自然女声)",
+            "aiyue": "艾悦(温柔女声)",
+            "aijing": "艾静(严厉女声)",
+            "xiaomei": "小美(甜美女声)",
+            "harry": "Harry(英音男声)",
+            "abby": "Abby(美音女声)",
+            "andy": "Andy(美音男声)",
+            "eric": "Eric(英音男声)",
+            "emily": "Emily(英音女声)",
+            "luna": "Luna(英音女声)",
+            "luca": "Luca(英音男声)",
+            "wendy": "Wendy(英音女声)",
+            "william": "William(英音男声)",
+            "olivia": "Olivia(英音女声)"
+        })
+    })
+    return {
+        'audio_voices_tencent': audio_voices_tencent,
+        'audio_voices_azure': audio_voices_azure,
+        'audio_voices_ali': audio_voices_ali,
     }
-}
 
-audio_voices_ali = {
-    "zh-CN": {
-        "zhixiaobai": "知小白(普通话女声)",
-        "zhixiaoxia": "知小夏(普通话女声)",
-        "zhixiaomei": "知小妹(普通话女声)",
-        "zhigui": "知柜(普通话女声)",
-        "zhishuo": "知硕(普通话男声)",
-        "aixia": "艾夏(普通话女声)",
-        "xiaoyun": "小云(标准女声)",
-        "xiaogang": "小刚(标准男声)",
-        "ruoxi": "若兮(温柔女声)",
-        "siqi": "思琪(温柔女声)",
-        "sijia": "思佳(标准女声)",
-        "sicheng": "思诚(标准男声)",
-        "aiqi": "艾琪(温柔女声)",
-        "aijia": "艾佳(标准女声)",
-        "aicheng": "艾诚(标准男声)",
-        "aida": "艾达(标准男声)",
-        "ninger": "宁儿(标准女声)",
-        "ruilin": "瑞琳(标准女声)",
-        "siyue": "思悦(温柔女声)",
-        "aiya": "艾雅(严厉女声)",
-        "aimei": "艾美(甜美女声)",
-        "aiyu": "艾雨(自然女声)",
-        "aiyue": "艾悦(温柔女声)",
-        "aijing": "艾静(严厉女声)",
-        "xiaomei": "小美(甜美女声)",
-        "aina": "艾娜(浙普女声)",
-        "yina": "依娜(浙普女声)",
-        "sijing": "思婧(严厉女声)",
-        "sitong": "思彤(儿童音)",
-        "xiaobei": "小北(萝莉女声)",
-        "aitong": "艾彤(儿童音)",
-        "aiwei": "艾薇(萝莉女声)",
-        "aibao": "艾宝(萝莉女声)"
-
-    },
-    "en-US": {
-        "zhixiaobai": "知小白(普通话女声)",
-        "zhixiaoxia": "知小夏(普通话女声)",
-        "zhixiaomei": "知小妹(普通话女声)",
-        "zhigui": "知柜(普通话女声)",
-        "zhishuo": "知硕(普通话男声)",
-        "aixia": "艾夏(普通话女声)",
-        "cally": "Cally(美式英文女声)",
-        "xiaoyun": "小云(标准女声)",
-        "xiaogang": "小刚(标准男声)",
-        "ruoxi": "若兮(温柔女声)",
-        "siqi": "思琪(温柔女声)",
-        "sijia": "思佳(标准女声)",
-        "sicheng": "思诚(标准男声)",
-        "aiqi": "艾琪(温柔女声)",
-        "aijia": "艾佳(标准女声)",
-        "aicheng": "艾诚(标准男声)",
-        "aida": "艾达(标准男声)",
-        "siyue": "思悦(温柔女声)",
-        "aiya": "艾雅(严厉女声)",
-        "aimei": "艾美(甜美女声)",
-        "aiyu": "艾雨(自然女声)",
-        "aiyue": "艾悦(温柔女声)",
-        "aijing": "艾静(严厉女声)",
-        "xiaomei": "小美(甜美女声)",
-        "harry": "Harry(英音男声)",
-        "abby": "Abby(美音女声)",
-        "andy": "Andy(美音男声)",
-        "eric": "Eric(英音男声)",
-        "emily": "Emily(英音女声)",
-        "luna": "Luna(英音女声)",
-        "luca": "Luca(英音男声)",
-        "wendy": "Wendy(英音女声)",
-        "william": "William(英音男声)",
-        "olivia": "Olivia(英音女声)"
-    }
-}
 
 transition_types = ['xfade']
 fade_list = ['fade', 'smoothleft', 'smoothright', 'smoothup', 'smoothdown', 'circlecrop', 'rectcrop', 'circleclose',
@@ -259,88 +285,155 @@ kuaishou_site = "https://cp.kuaishou.com/article/publish/video"
 xiaohongshu_site = "https://creator.xiaohongshu.com/publish/publish?source=official"
 
 # 获取当前脚本的绝对路径
-script_path = os.path.abspath(__file__)
-
-# print("当前脚本的绝对路径是:", script_path)
+script_path = Path(__file__).absolute()
 
 # 脚本所在的目录
-script_dir = os.path.dirname(script_path)
+script_dir = script_path.parent
 
 config_example_file_name = "config.example.yml"
 config_file_name = "config.yml"
-session_file_name = "session.yml"
+session_file_name = "session.json"
+legacy_session_file_name = "session.yml"
+
+config_example_file = script_dir / config_example_file_name
+config_file = script_dir / config_file_name
+session_file = script_dir / session_file_name
+legacy_session_file = script_dir / legacy_session_file_name
+exclude_keys = frozenset({'01_first_visit', '02_first_visit', '03_first_visit', '04_first_visit', 'reference_audio',
+                          'audio_temperature', 'audio_voice'})
+
+
+# session 文件解析缓存: (修改时间, 数据)
+_session_cache = (None, None)
+
 
-config_example_file = os.path.join(script_dir, config_example_file_name)
-config_file = os.path.join(script_dir, config_file_name)
-session_file = os.path.join(script_dir, session_file_name)
-exclude_keys = ['01_first_visit', '02_first_visit', '03_first_visit', '04_first_visit','reference_audio','audio_temperature','audio_voice']
+def _load_legacy_session():
+    # 兼容旧版本的 session.yml, 下次保存时会写成 session.json
+    try:
+        with open(legacy_session_file, 'rb') as file:
+            return yaml.load(file, Loader=yaml_loader) or {}
+    except FileNotFoundError:
+        return {}
+
+
+def _load_session_cached():
+    global _session_cache
+    try:
+        cache_key = os.stat(session_file).st_mtime_ns
+    except FileNotFoundError:
+        return _load_legacy_session()
+    if _session_cache[0] != cache_key:
+        with open(session_file, 'rb') as file:
+            _session_cache = (cache_key, orjson.loads(file.read()) or {})
+    # 每个会话拿到自己的副本, 避免不同会话共享同一个列表/字典
+    return copy.deepcopy(_session_cache[1])
+
+
+def _session_json_default(obj):
+    # deque 等容器按列表保存
+    if isinstance(obj, (deque, set, frozenset)):
+        return list(obj)
+    raise TypeError
 
 
 def save_session_state_to_yaml():
+    import streamlit as st
     # 创建一个字典副本，排除指定的键
     state_to_save = {key: value for key, value in st.session_state.items() if key not in exclude_keys}
 
-    """将 Streamlit session_state 中的所有值保存到 YAML 文件"""
-    with open(session_file, 'w') as file:
-        yaml.dump(dict(state_to_save), file)
+    """将 Streamlit session_state 中的所有值保存到 session 文件"""
+    # 先写临时文件再替换，避免读取到写了一半的 session 文件
+    tmp_file = session_file.with_name(session_file_name + ".tmp")
+    session_data = orjson.dumps(state_to_save, default=_session_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    with open(tmp_file, 'wb') as file:
+        file.write(session_data)
+    os.replace(tmp_file, session_file)
+    # 缓存按写入内容重新解析的数据, 与从文件读取的结果一致, 且不引用当前会话中的对象
+    global _session_cache
+    _session_cache = (os.stat(session_file).st_mtime_ns, orjson.loads(session_data) or {})
 
 
 def delete_first_visit_session_state(first_visit):
+    import streamlit as st
     # 从session_state中删除其他first_vist标记
+    session_state = st.session_state
     for key in exclude_keys:
-        if key != first_visit and key in st.session_state:
-            del st.session_state[key]
+        if key != first_visit:
+            session_state.pop(key, None)
 
 
 def load_session_state_from_yaml(first_visit):
+    import streamlit as st
     delete_first_visit_session_state(first_visit)
     # 检查是否存在 "first_visit" 标志
     if first_visit not in st.session_state:
         # 第一次进入页面，设置标志为 True
         st.session_state[first_visit] = True
-        """从 YAML 文件中读取数据并更新 session_state"""
-        if os.path.exists(session_file):
-            try:
-                with open(session_file, 'r') as file:
-                    data = yaml.safe_load(file)
-                    for key, value in data.items():
-                        st.session_state[key] = value
-            except FileNotFoundError:
-                st.warning(f"File {session_file} not found.")
+        """从 session 文件中读取数据并更新 session_state"""
+        for key, value in _load_session_cached().items():
+            st.session_state[key] = value
     else:
         # 后续访问页面，标志设置为 False
         st.session_state[first_visit] = False
 
 
+_env_var_pattern = re.compile(r'\$\{([^}]+)\}')
+
+
+def _replace_env_var(match, environ=os.environ):
+    # Keep original if env var not found
+    return environ.get(match.group(1), match.group(0))
+
+
 def substitute_env_vars(obj):
     """
     Recursively substitute environment variables in a nested data structure.
     Supports ${VAR_NAME} syntax.
+    Dicts and lists are updated in place.
     """
     if isinstance(obj, dict):
-        return {key: substitute_env_vars(value) for key, value in obj.items()}
+        for key, value in obj.items():
+            if isinstance(value, (dict, list, str)):
+                obj[key] = substitute_env_vars(value)
+        return obj
     elif isinstance(obj, list):
-        return [substitute_env_vars(item) for item in obj]
+        for index, item in enumerate(obj):
+            if isinstance(item, (dict, list, str)):
+                obj[index] = substitute_env_vars(item)
+        return obj
     elif isinstance(obj, str):
+        if '${' not in obj:
+            return obj
         # Replace ${VAR_NAME} with environment variable values
-        def replace_var(match):
-            var_name = match.group(1)
-            return os.getenv(var_name, match.group(0))  # Keep original if env var not found
-
-        return re.sub(r'\$\{([^}]+)\}', replace_var, obj)
+        return _env_var_pattern.sub(_replace_env_var, obj)
     else:
         return obj
 
+# 配置文件解析缓存，key 为 (文件路径, 修改时间)
+_config_cache = {}
+
+
 def load_config():
-    print("load_config")
-    # 加载配置文件
-    if not os.path.exists(config_file):
+    logger.debug("load_config")
+    # 加载配置文件, 只做一次 stat, 文件不存在时从示例文件复制
+    try:
+        config_stat = os.stat(config_file)
+    except FileNotFoundError:
         shutil.copy(config_example_file, config_file)
-    if os.path.exists(config_file):
-        config_data = read_yaml(config_file)
-        # Substitute environment variables
+        config_stat = os.stat(config_file)
+    cache_key = (config_file, config_stat.st_mtime_ns)
+    if cache_key in _config_cache:
+        return _config_cache[cache_key]
+    with open(config_file, 'rb') as f:
+        raw_data = f.read()
+    config_data = yaml.load(raw_data, Loader=yaml_loader)
+    # Substitute environment variables, 没有 ${ 时无需遍历整棵配置树
+    if b'${' in raw_data:
+        _ensure_env_loaded()
         config_data = substitute_env_vars(config_data)
-        return config_data
+    _config_cache.clear()
+    _config_cache[cache_key] = config_data
+    return config_data
 
 
 def test_config(todo_config, *args):
@@ -352,10 +445,27 @@ def test_config(todo_config, *args):
 
 
 def save_config():
-    # 保存配置文件
-    if os.path.exists(config_file):
-        save_yaml(config_file, my_config)
+    # 保存配置文件, my_config 从未被访问过时没有需要保存的改动
+    config_data = globals().get('my_config')
+    if config_data is not None and config_file.is_file():
+        save_yaml(config_file, config_data)
+        # 刚保存的内容与内存一致, 直接按新的修改时间缓存, 避免下次 load_config 重新解析
+        _config_cache.clear()
+        _config_cache[(config_file, os.stat(config_file).st_mtime_ns)] = config_data
+
 
+_audio_voices_names = frozenset({'audio_voices_tencent', 'audio_voices_azure', 'audio_voices_ali'})
 
-my_config = load_config()
+
+def __getattr__(name):
+    # 第一次访问 my_config 时才加载配置文件
+    if name == 'my_config':
+        config_data = load_config()
+        globals()['my_config'] = config_data
+        return config_data
+    if name in _audio_voices_names:
+        audio_voices = _build_audio_voices()
+        globals().update(audio_voices)
+        return audio_voices[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
@@ -21,18 +21,216 @@
 #
 
 import streamlit as st
+import codecs
+import fnmatch
 import os
-from pathlib import Path
+import queue
+import re
+import stat
+import threading
+import uuid
+from collections import deque
+from operator import attrgetter
 from typing import Optional, Tuple
 
 from config.config import my_config, save_config, load_session_state_from_yaml
 from pages.common import common_ui
 from tools.tr_utils import tr
 
+INVALID_PATH_CHARS = frozenset('<>|*?')
+QUOTED_PATH_PATTERN = re.compile(r'([\'"])(.*)\1', re.DOTALL)
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def check_file_readable(path: str, mtime_ns: int, size: int) -> Tuple[bool, str]:
+    """Check that a file is readable, cached until its mtime or size changes."""
+    if not os.access(path, os.R_OK):
+        return False, tr("File cannot be read or is not a text file")
+    
+    return True, ""
+
+
+def check_text_file(path: str) -> bool:
+    """Check that a file starts with valid UTF-8 text by sniffing its first bytes."""
+    try:
+        fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            head = os.read(fd, 512)
+        finally:
+            os.close(fd)
+        # final=False tolerates a multi-byte character cut off at the end of the sniffed block
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+    except (OSError, UnicodeDecodeError):
+        return False
+    
+    return b'\x00' not in head
+
+
+@st.cache_resource
+def get_file_dialog_requests() -> queue.Queue:
+    """Start one thread owning a hidden Tk root that serves all file dialog requests.
+    
+    Tk objects must stay on the thread that created them and Streamlit runs every rerun on a new
+    thread, so the root lives on its own thread instead of being rebuilt per click.
+    """
+    requests = queue.Queue()
+    
+    def serve():
+        root = None
+        try:
+            while True:
+                title, result = requests.get()
+                try:
+                    import tkinter as tk
+                    from tkinter import filedialog
+                    
+                    # The root is created on first use and rebuilt after a failure (e.g. no display)
+                    if root is None:
+                        root = tk.Tk()
+                        root.withdraw()
+                        root.attributes('-topmost', True)
+                    file_path = filedialog.askopenfilename(
+                        parent=root,
+                        title=title,
+                        filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
+                    )
+                except Exception as e:
+                    if root is not None:
+                        try:
+                            root.destroy()
+                        except Exception:
+                            pass
+                        root = None
+                    # Hand the error to the waiting script thread instead of leaving it blocked
+                    result.put(e)
+                else:
+                    result.put(file_path)
+        finally:
+            # Never keep a dead serve thread cached, the next Browse click starts a new one
+            get_file_dialog_requests.clear()
+    
+    threading.Thread(target=serve, name="aigc-file-dialog", daemon=True).start()
+    return requests
+
+
+class ConfigSaveDebouncer:
+    """Coalesce bursts of save_config() calls into a single write after a quiet period."""
+    
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._dirty = False
+    
+    def schedule(self):
+        with self._lock:
+            self._dirty = True
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+    
+    def flush(self):
+        """Write the config now if a save is pending."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+        save_config()
+
+
+@st.cache_resource
+def load_aigc_service_class():
+    """Import the AIGC service once per server process; failed imports are retried on the next rerun."""
+    from services.aigc.aigc_service import AIGCService
+    return AIGCService
+
+
+class RewriteJob:
+    """Run AIGCService.process_files on a worker thread and hand its events to the page through a queue."""
+    
+    def __init__(self, aigc_service_class, config: dict, caption_path: str, tts_path: Optional[str]):
+        self.events = queue.Queue()
+        self.progress = (0.0, "")
+        self.success = False
+        self.error: Optional[Exception] = None
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(aigc_service_class, config, caption_path, tts_path),
+            name="aigc-rewrite",
+            daemon=True
+        )
+    
+    def _run(self, aigc_service_class, config, caption_path, tts_path):
+        try:
+            self.success = aigc_service_class().process_files(
+                caption_path=caption_path,
+                tts_path=tts_path,
+                config=config,
+                progress_callback=lambda p, s: self.events.put(('progress', p, s)),
+                log_callback=lambda msg: self.events.put(('log', msg))
+            )
+        except Exception as e:
+            self.error = e
+    
+    def start(self):
+        self._thread.start()
+    
+    def is_alive(self) -> bool:
+        return self._thread.is_alive()
+    
+    def drain_events(self):
+        while True:
+            try:
+                yield self.events.get_nowait()
+            except queue.Empty:
+                return
+
+
+@st.cache_resource
+def get_rewrite_jobs() -> dict:
+    """Running rewrite jobs by id; only the id is kept in session state since it is persisted to disk."""
+    return {}
+
+
+@st.cache_resource
+def get_config_save_debouncer() -> ConfigSaveDebouncer:
+    return ConfigSaveDebouncer(0.5)
+
 
 class AIGCRewriterPage:
     """Optimized AIGC Rewriter Page Class"""
     
+    CONFIG_DEFAULTS = {
+        'aigc_api_key': '',
+        'aigc_model': 'deepseek-chat',
+        'aigc_base_url': 'https://api.deepseek.com',
+        'aigc_max_tokens': 8192,
+        'aigc_temperature': 0.8,
+        'aigc_stream': True,
+        'aigc_no_reasoning': False,
+        'aigc_num_variants': 25,
+        'aigc_variants_per_request': 1,
+        'aigc_use_tts': True
+    }
+    
+    CONFIG_MAPPING = {
+        'aigc_api_key': 'api_key',
+        'aigc_model': 'model',
+        'aigc_base_url': 'base_url',
+        'aigc_max_tokens': 'max_tokens',
+        'aigc_temperature': 'temperature',
+        'aigc_stream': 'stream',
+        'aigc_no_reasoning': 'no_reasoning'
+    }
+    
+    MODEL_OPTIONS = ('deepseek-chat', 'deepseek-reasoner', 'gpt-3.5-turbo', 'gpt-4')
+    MODEL_INDEX = {model: index for index, model in enumerate(MODEL_OPTIONS)}
+    
     def __init__(self):
         self.setup_page()
         self.load_config()
@@ -60,52 +258,32 @@ class AIGCRewriterPage:
         
         # Check service availability
         try:
-            from services.aigc.aigc_service import AIGCService
-            self.aigc_service = AIGCService
+            self.aigc_service = load_aigc_service_class()
         except ImportError:
             st.error(tr("AIGC service is not available"))
             st.stop()
     
     def load_config(self):
         """Load AIGC configuration with defaults."""
+        missing_keys = [key for key in self.CONFIG_DEFAULTS if key not in st.session_state]
+        if not missing_keys:
+            return
+        
         aigc_config = my_config.get('aigc', {})
-        defaults = {
-            'aigc_api_key': '',
-            'aigc_model': 'deepseek-chat',
-            'aigc_base_url': 'https://api.deepseek.com',
-            'aigc_max_tokens': 8192,
-            'aigc_temperature': 0.8,
-            'aigc_stream': True,
-            'aigc_no_reasoning': False,
-            'aigc_num_variants': 25,
-            'aigc_variants_per_request': 1,
-            'aigc_use_tts': True
-        }
-        
-        for key, default in defaults.items():
-            if key not in st.session_state:
-                st.session_state[key] = aigc_config.get(key.replace('aigc_', ''), default)
+        for key in missing_keys:
+            st.session_state[key] = aigc_config.get(key.replace('aigc_', ''), self.CONFIG_DEFAULTS[key])
     
     def save_config(self):
         """Save current configuration."""
-        if 'aigc' not in my_config:
-            my_config['aigc'] = {}
-        
-        config_mapping = {
-            'aigc_api_key': 'api_key',
-            'aigc_model': 'model', 
-            'aigc_base_url': 'base_url',
-            'aigc_max_tokens': 'max_tokens',
-            'aigc_temperature': 'temperature',
-            'aigc_stream': 'stream',
-            'aigc_no_reasoning': 'no_reasoning'
-        }
-        
-        for session_key, config_key in config_mapping.items():
-            if session_key in st.session_state:
-                my_config['aigc'][config_key] = st.session_state[session_key]
-        
-        save_config()
+        session_state = st.session_state
+        my_config.setdefault('aigc', {}).update({
+            config_key: session_state[session_key]
+            for session_key, config_key in self.CONFIG_MAPPING.items()
+            if session_key in session_state
+        })
+        
+        # my_config is already up to date in memory, coalesce the file writes
+        get_config_save_debouncer().schedule()
     
     @staticmethod
     def clean_file_path(raw_path: str) -> Tuple[str, str]:
@@ -117,14 +295,13 @@ class AIGCRewriterPage:
         message = ""
         
         # Remove quotes
-        if (cleaned.startswith('"') and cleaned.endswith('"')) or \
-           (cleaned.startswith("'") and cleaned.endswith("'")):
-            cleaned = cleaned[1:-1]
+        quoted = QUOTED_PATH_PATTERN.fullmatch(cleaned)
+        if quoted:
+            cleaned = quoted.group(2)
             message = tr("Path cleaned: quotes removed")
         
         # Basic validation
-        invalid_chars = ['<', '>', '|', '*', '?']
-        if any(char in cleaned for char in invalid_chars):
+        if not INVALID_PATH_CHARS.isdisjoint(cleaned):
             return "", tr("Path contains invalid characters")
         
         return cleaned, message
@@ -135,36 +312,25 @@ class AIGCRewriterPage:
         if not path:
             return False, tr("Please provide a valid file path")
         
-        path_obj = Path(path)
-        if not path_obj.exists():
+        try:
+            path_stat = os.stat(path)
+        except OSError:
             return False, tr("File not found")
-        if not path_obj.is_file():
+        if not stat.S_ISREG(path_stat.st_mode):
             return False, tr("Invalid file path")
+        if path_stat.st_size == 0:
+            return False, tr("Empty file")
         
-        try:
-            with open(path_obj, 'r', encoding='utf-8') as f:
-                f.read(1)
-        except (PermissionError, UnicodeDecodeError):
-            return False, tr("File cannot be read or is not a text file")
-        
-        return True, ""
+        return check_file_readable(path, path_stat.st_mtime_ns, path_stat.st_size)
     
     @staticmethod
     def browse_file(title: str) -> str:
         """Open file browser dialog."""
-        import tkinter as tk
-        from tkinter import filedialog
-        
-        root = tk.Tk()
-        root.withdraw()
-        root.attributes('-topmost', True)
-        
-        file_path = filedialog.askopenfilename(
-            title=title,
-            filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
-        )
-        
-        root.destroy()
+        result = queue.Queue(maxsize=1)
+        get_file_dialog_requests().put((title, result))
+        file_path = result.get()
+        if isinstance(file_path, Exception):
+            raise file_path
         return file_path or ''
     
     def create_file_input(self, label: str, session_key: str, browse_key: str, help_text: str, required: bool = True) -> Optional[str]:
@@ -280,10 +446,9 @@ class AIGCRewriterPage:
                 on_change=self.save_config
             )
             
-            model_options = ['deepseek-chat', 'deepseek-reasoner', 'gpt-3.5-turbo', 'gpt-4']
             model = st.selectbox(
-                tr("Model"), model_options,
-                index=model_options.index(st.session_state.get('aigc_model', 'deepseek-chat')),
+                tr("Model"), self.MODEL_OPTIONS,
+                index=self.MODEL_INDEX.get(st.session_state.get('aigc_model', 'deepseek-chat'), 0),
                 key='aigc_model', on_change=self.save_config
             )
             
@@ -310,37 +475,33 @@ class AIGCRewriterPage:
     
     def validate_inputs(self, use_tts: bool, tts_path: Optional[str], caption_path: Optional[str], api_key: str) -> Tuple[bool, str]:
         """Validate all inputs."""
-        if not caption_path:
-            return False, tr("Please provide caption file path")
-        
-        caption_valid, caption_error = self.validate_file_path(caption_path)
-        if not caption_valid:
-            return False, caption_error
-        
+        required_files = [(caption_path, "Please provide caption file path")]
         if use_tts:
-            if not tts_path:
-                return False, tr("Please provide TTS file path")
-            tts_valid, tts_error = self.validate_file_path(tts_path)
-            if not tts_valid:
-                return False, tts_error
+            required_files.append((tts_path, "Please provide TTS file path"))
+        
+        for path, missing_message in required_files:
+            if not path:
+                return False, tr(missing_message)
+            valid, error = self.validate_file_path(path)
+            if not valid:
+                return False, error
         
         if not api_key:
             return False, tr("Please configure API key")
         
         return True, tr("Ready to process")
     
-    def update_log(self, log_area, message):
+    def update_log(self, log_area, *messages):
         """Update processing log."""
-        if 'aigc_log_messages' not in st.session_state:
-            st.session_state['aigc_log_messages'] = []
-        
-        st.session_state['aigc_log_messages'].append(str(message))
+        log_messages = st.session_state.get('aigc_log_messages')
+        if not isinstance(log_messages, deque):
+            # Keep last 50 messages
+            log_messages = deque(log_messages or (), maxlen=50)
+            st.session_state['aigc_log_messages'] = log_messages
         
-        # Keep last 50 messages
-        if len(st.session_state['aigc_log_messages']) > 50:
-            st.session_state['aigc_log_messages'] = st.session_state['aigc_log_messages'][-50:]
+        log_messages.extend(str(message) for message in messages)
         
-        log_content = "\n".join(st.session_state['aigc_log_messages'])
+        log_content = "\n".join(log_messages)
         log_area.code(log_content, language=None)
     
     @staticmethod
@@ -360,15 +521,19 @@ class AIGCRewriterPage:
             if not file_path:
                 return
             
-            file_dir = Path(file_path).parent
-            files = list(file_dir.glob(pattern))
+            file_dir = os.path.dirname(file_path) or '.'
+            try:
+                with os.scandir(file_dir) as entries:
+                    files = [entry for entry in entries if fnmatch.fnmatch(entry.name, pattern)]
+            except FileNotFoundError:
+                files = []
             
             if files:
                 st.markdown(f"**{tr(f'{file_type} Variants:')}** ({len(files)} {tr('files generated')})")
                 st.info(f"**{tr('Files saved to:')}** `{file_dir}`")
                 
-                for f in sorted(files):
-                    st.text(f"{icon} {f.name} - {f.stat().st_size} bytes")
+                for entry in sorted(files, key=attrgetter('name')):
+                    st.text(f"{icon} {entry.name} - {entry.stat().st_size} bytes")
             else:
                 # If no files found in expected directory, check if they might be elsewhere
                 st.warning(f"⚠️ No {file_type.lower()} variants found in `{file_dir}`")
@@ -381,7 +546,7 @@ class AIGCRewriterPage:
             show_files("TTS", "variant_*_tts.txt", "🎤", tts_path)
     
     def process_files(self, config: dict, caption_path: str, tts_path: Optional[str]):
-        """Process files with AIGC service."""
+        """Process files with AIGC service on a worker thread; runs as a fragment that polls its progress."""
         progress_placeholder = st.empty()
         log_placeholder = st.empty()
         
@@ -394,29 +559,65 @@ class AIGCRewriterPage:
             st.markdown(f"### {tr('Processing Log')}")
             log_area = st.empty()
         
-        try:
-            aigc_service = self.aigc_service()
-            
-            success = aigc_service.process_files(
-                caption_path=caption_path,
-                tts_path=tts_path,
-                config=config,
-                progress_callback=lambda p, s: self.update_progress(progress_bar, status_text, p, s),
-                log_callback=lambda msg: self.update_log(log_area, msg)
-            )
+        jobs = get_rewrite_jobs()
+        job_id = st.session_state.get('aigc_job_id')
+        job = jobs.get(job_id)
+        if job is None:
+            for path in (caption_path, tts_path):
+                if path and not check_text_file(path):
+                    self.finish_processing('error', tr("File cannot be read or is not a text file") + f" `{path}`",
+                                           config['use_tts'])
             
-            if success:
-                st.success(tr("Rewriting completed successfully!"))
-                self.display_results(config['use_tts'])
+            job = RewriteJob(self.aigc_service, config, caption_path, tts_path)
+            job_id = uuid.uuid4().hex
+            jobs[job_id] = job
+            st.session_state['aigc_job_id'] = job_id
+            job.start()
+        
+        # Check before draining so no event is left behind once the worker has finished
+        finished = not job.is_alive()
+        log_messages = []
+        for event in job.drain_events():
+            if event[0] == 'progress':
+                job.progress = event[1:]
             else:
-                st.error(tr("Rewriting failed. Please check the logs above."))
-                
-        except Exception as e:
-            st.error(tr("Error during processing:") + f" {str(e)}")
-            st.exception(e)
+                log_messages.append(event[1])
+        self.update_progress(progress_bar, status_text, *job.progress)
+        self.update_log(log_area, *log_messages)
         
-        finally:
-            st.session_state['aigc_running'] = False
+        if not finished:
+            # The fragment polls again after run_every
+            return
+        
+        jobs.pop(job_id, None)
+        st.session_state.pop('aigc_job_id', None)
+        
+        if job.error is not None:
+            self.finish_processing('error', tr("Error during processing:") + f" {str(job.error)}", config['use_tts'])
+        elif job.success:
+            self.finish_processing('success', tr("Rewriting completed successfully!"), config['use_tts'])
+        else:
+            self.finish_processing('failed', tr("Rewriting failed. Please check the logs above."), config['use_tts'])
+    
+    @staticmethod
+    def finish_processing(status: str, message: str, use_tts: bool):
+        """Record the outcome and rerun the whole page so the controls are enabled again."""
+        st.session_state['aigc_running'] = False
+        st.session_state['aigc_last_result'] = {'status': status, 'message': message, 'use_tts': use_tts}
+        st.rerun()
+    
+    def show_last_result(self):
+        """Show the outcome of the run that just finished, once."""
+        result = st.session_state.pop('aigc_last_result')
+        
+        st.markdown(f"### {tr('Processing Log')}")
+        st.code("\n".join(st.session_state.get('aigc_log_messages') or ()), language=None)
+        
+        if result['status'] == 'success':
+            st.success(result['message'])
+            self.display_results(result['use_tts'])
+        else:
+            st.error(result['message'])
     
     def run(self):
         """Main application logic."""
@@ -445,8 +646,9 @@ class AIGCRewriterPage:
                 type="primary",
                 use_container_width=True
             ):
+                get_config_save_debouncer().flush()
                 st.session_state['aigc_running'] = True
-                st.session_state['aigc_log_messages'] = []
+                st.session_state['aigc_log_messages'] = deque(maxlen=50)
                 st.session_state['aigc_caption_file_path'] = caption_path
                 st.session_state['aigc_tts_file_path'] = tts_path
                 st.rerun()
@@ -463,18 +665,23 @@ class AIGCRewriterPage:
                 'use_tts': use_tts
             }
             
-            self.process_files(
+            # Only the processing area reruns while the worker is busy
+            fragment = getattr(st, 'fragment', None) or st.experimental_fragment
+            fragment(self.process_files, run_every=0.5)(
                 config, 
                 st.session_state.get('aigc_caption_file_path'),
                 st.session_state.get('aigc_tts_file_path')
             )
+        elif 'aigc_last_result' in st.session_state:
+            st.markdown("---")
+            self.show_last_result()
         
         # Footer
         st.markdown("---")
         st.markdown(f"*{tr('Tip: For best results, ensure your caption files contain clear, well-structured content with hashtags at the end.')}*")
 
 
-# Initialize and run the application
-if __name__ == "__main__" or True:  # Always run in Streamlit context
+# Initialize and run the application, Streamlit executes pages as __main__
+if __name__ == "__main__":
     app = AIGCRewriterPage()
     app.run()
@@ -4,20 +4,24 @@ AIGC Service for MoneyPrinterPlus
 Integrates TikTokRewriter functionality into the MMP web UI
 """
 
+import logging
+import math
 import os
+import queue
+import stat
 import sys
-import tempfile
-import shutil
 import threading
 from pathlib import Path
 from typing import Optional, Callable, Dict, Any
-import subprocess
-import time
 
 # Add AIGC path to Python path
-aigc_path = Path(__file__).parent.parent.parent.parent / "aigc"
-if str(aigc_path) not in sys.path:
-    sys.path.insert(0, str(aigc_path))
+aigc_path = Path(__file__).resolve().parents[3] / "aigc"
+_aigc_path_str = str(aigc_path)
+if _aigc_path_str not in sys.path:
+    sys.path.insert(0, _aigc_path_str)
+
+# Set once the AIGC directory has been found, so later checks skip the stat
+_aigc_dir_exists = False
 
 try:
     from rewriter_core import RewriterConfig, Rewriter
@@ -25,6 +29,93 @@ except ImportError:
     RewriterConfig = None
     Rewriter = None
 
+logger = logging.getLogger(__name__)
+
+# USD per million tokens; cached_input is the price of a prompt-cache hit
+MODEL_PRICING = {
+    'deepseek-chat': {'input': 0.27, 'cached_input': 0.07, 'output': 1.10},
+    'deepseek-reasoner': {'input': 0.55, 'cached_input': 0.14, 'output': 2.19},
+    'gpt-3.5-turbo': {'input': 0.50, 'cached_input': 0.50, 'output': 1.50},
+    'gpt-4': {'input': 30.0, 'cached_input': 30.0, 'output': 60.0},
+    'gpt-4-turbo': {'input': 10.0, 'cached_input': 10.0, 'output': 30.0},
+    'claude-3-sonnet': {'input': 3.0, 'cached_input': 0.30, 'output': 15.0},
+    'claude-3-haiku': {'input': 0.25, 'cached_input': 0.03, 'output': 1.25},
+}
+DEFAULT_PRICING = {'input': 1.0, 'cached_input': 1.0, 'output': 2.0}
+
+# tiktoken encoders by model name
+_encoders: Dict[str, Any] = {}
+
+
+def count_tokens(text: str, model: str) -> Optional[int]:
+    """
+    Count tokens with tiktoken. Models tiktoken does not know (DeepSeek,
+    Claude) use cl100k_base. Returns None if tiktoken is unavailable.
+    """
+    encoder = _encoders.get(model)
+    if encoder is None:
+        try:
+            import tiktoken
+            try:
+                encoder = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            # Not installed, or the encoding files could not be downloaded
+            return None
+        _encoders[model] = encoder
+    return len(encoder.encode(text))
+
+
+# rewrite_tiktok_ds.py always prints the output file names in lower case
+_VARIANT_MARKER = "variant_"
+
+
+class _CallbackDispatcher:
+    """
+    Run UI callbacks on a daemon thread so a slow consumer does not stall
+    the rewriter's output loop. When the queue is full the oldest pending
+    call is dropped and counted in ``dropped``.
+    """
+
+    _STOP = object()
+
+    def __init__(self, maxsize: int = 256):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._drain, name="aigc-callbacks", daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            fn, args = item
+            try:
+                fn(*args)
+            except Exception:
+                logger.exception("AIGC callback %r failed", fn)
+
+    def put(self, fn: Callable, *args):
+        while True:
+            try:
+                self._queue.put_nowait((fn, args))
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    continue
+                self.dropped += 1
+                logger.warning("AIGC callback queue full, dropped oldest pending call (%d dropped so far)",
+                               self.dropped)
+
+    def close(self):
+        """Run everything still queued, then stop the worker thread."""
+        self._queue.put(self._STOP)
+        self._thread.join()
+
 
 class AIGCService:
     """
@@ -44,10 +135,12 @@ class AIGCService:
             )
 
         # Check if AIGC directory exists
-        aigc_dir = Path(__file__).parent.parent.parent.parent / "aigc"
-        if not aigc_dir.exists():
+        global _aigc_dir_exists
+        if not _aigc_dir_exists:
+            _aigc_dir_exists = aigc_path.exists()
+        if not _aigc_dir_exists:
             raise FileNotFoundError(
-                f"AIGC directory not found at {aigc_dir}. "
+                f"AIGC directory not found at {aigc_path}. "
                 "Please ensure TikTokRewriter is properly installed."
             )
 
@@ -80,14 +173,20 @@ class AIGCService:
             # Log start
             if log_callback:
                 log_callback(f"Starting AIGC processing...")
+                caption_dir = os.path.dirname(caption_path)
                 log_callback(f"Caption file: {caption_path}")
-                log_callback(f"Caption directory: {Path(caption_path).parent}")
+                log_callback(f"Caption directory: {caption_dir}")
                 if tts_path:
+                    tts_dir = os.path.dirname(tts_path)
                     log_callback(f"TTS file: {tts_path}")
-                    log_callback(f"TTS directory: {Path(tts_path).parent}")
-                    log_callback(f"Different directories: {Path(tts_path).parent != Path(caption_path).parent}")
+                    log_callback(f"TTS directory: {tts_dir}")
+                    log_callback(f"Different directories: {os.path.normcase(tts_dir) != os.path.normcase(caption_dir)}")
                 else:
                     log_callback("Mode: Caption-only (no TTS)")
+                num_variants = config.get('num_variants', 3)
+                variants_per_request = max(1, config.get('variants_per_request', 1))
+                log_callback(f"API requests: {math.ceil(num_variants / variants_per_request)} "
+                             f"for {num_variants} variants ({variants_per_request} per request)")
 
             # Create RewriterConfig
             rewriter_config = RewriterConfig(
@@ -120,28 +219,33 @@ class AIGCService:
             progress_step = 0.5 / max(1, config.get('num_variants', 3))  # Distribute remaining progress
             current_progress = 0.5
 
+            dispatcher = _CallbackDispatcher()
+
             def stdout_callback(line: str):
                 if log_callback:
-                    log_callback(f"[STDOUT] {line.strip()}")
+                    dispatcher.put(log_callback, f"[STDOUT] {line.strip()}")
                 # Update progress based on output
                 nonlocal current_progress
-                if "variant_" in line.lower():
+                if _VARIANT_MARKER in line:
                     current_progress += progress_step
                     if progress_callback:
-                        progress_callback(min(current_progress, 0.9), f"Processing variant...")
+                        dispatcher.put(progress_callback, min(current_progress, 0.9), f"Processing variant...")
 
             def stderr_callback(line: str):
                 if log_callback:
-                    log_callback(f"[STDERR] {line.strip()}")
+                    dispatcher.put(log_callback, f"[STDERR] {line.strip()}")
 
             # Run the rewriter
             if log_callback:
                 log_callback("Executing TikTokRewriter...")
 
-            exit_code = rewriter.run(
-                on_stdout=stdout_callback,
-                on_stderr=stderr_callback
-            )
+            try:
+                exit_code = rewriter.run(
+                    on_stdout=stdout_callback,
+                    on_stderr=stderr_callback
+                )
+            finally:
+                dispatcher.close()
 
             if progress_callback:
                 progress_callback(1.0, "Processing completed")
@@ -170,30 +274,22 @@ class AIGCService:
             tuple: (is_valid, error_message)
         """
         try:
-            # Check caption file
-            if not Path(caption_path).exists():
-                return False, "Caption file does not exist"
-
-            if not Path(caption_path).is_file():
-                return False, "Caption path is not a file"
-
-            # Check TTS file if provided
+            # One stat per file covers existence, type and size
+            checks = [(caption_path, "Caption")]
             if tts_path:
-                if not Path(tts_path).exists():
-                    return False, "TTS file does not exist"
+                checks.append((tts_path, "TTS"))
 
-                if not Path(tts_path).is_file():
-                    return False, "TTS path is not a file"
+            for path, label in checks:
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    return False, f"{label} file does not exist"
 
-            # Check file sizes (reasonable limits)
-            caption_size = Path(caption_path).stat().st_size
-            if caption_size > 10 * 1024 * 1024:  # 10MB limit
-                return False, "Caption file is too large (>10MB)"
+                if not stat.S_ISREG(st.st_mode):
+                    return False, f"{label} path is not a file"
 
-            if tts_path:
-                tts_size = Path(tts_path).stat().st_size
-                if tts_size > 10 * 1024 * 1024:  # 10MB limit
-                    return False, "TTS file is too large (>10MB)"
+                if st.st_size > 10 * 1024 * 1024:  # 10MB limit
+                    return False, f"{label} file is too large (>10MB)"
 
             return True, "Files are valid"
 
@@ -217,42 +313,75 @@ class AIGCService:
             'claude-3-haiku'
         ]
 
-    def estimate_cost(self, config: Dict[str, Any], caption_length: int, tts_length: int = 0) -> Dict[str, Any]:
+    def estimate_cost(
+        self,
+        config: Dict[str, Any],
+        caption_length: int,
+        tts_length: int = 0,
+        caption_text: Optional[str] = None,
+        tts_text: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Estimate the cost of processing based on input sizes.
 
+        Every API request re-sends the same caption/TTS prompt, so after the
+        first request the input is billed at the provider's cached-prefix rate.
+
         Args:
             config: Configuration dictionary
             caption_length: Length of caption text in characters
             tts_length: Length of TTS text in characters
+            caption_text: Optional caption text, counted with tiktoken when given
+            tts_text: Optional TTS text, counted with tiktoken when given
 
         Returns:
             dict: Cost estimation information
         """
         model = config.get('model', 'deepseek-chat')
         num_variants = config.get('num_variants', 3)
-
-        # Rough token estimation (characters * 0.3 for English, 0.5 for Chinese/mixed)
-        caption_tokens = int(caption_length * 0.4)  # Average for mixed content
-        tts_tokens = int(tts_length * 0.4) if tts_length > 0 else 0
-
-        # Total tokens per variant
-        total_input_tokens = caption_tokens + tts_tokens
-        estimated_output_tokens = int(total_input_tokens * 1.5)  # Estimate output size
-
-        # Cost estimation (rough, will vary by provider)
-        cost_per_1k_input = 0.001  # $0.001 per 1K input tokens
-        cost_per_1k_output = 0.002  # $0.002 per 1K output tokens
-
-        total_input_cost = (total_input_tokens * num_variants / 1000) * cost_per_1k_input
-        total_output_cost = (estimated_output_tokens * num_variants / 1000) * cost_per_1k_output
-        total_cost = total_input_cost + total_output_cost
+        variants_per_request = max(1, config.get('variants_per_request', 1))
+        num_requests = math.ceil(num_variants / variants_per_request)
+
+        # Count real tokens when the text is available, otherwise fall back to
+        # a rough estimate (characters * 0.3 for English, 0.5 for Chinese/mixed)
+        caption_tokens = tts_tokens = None
+        if caption_text is not None:
+            caption_length = len(caption_text)
+            caption_tokens = count_tokens(caption_text, model)
+        if tts_text is not None:
+            tts_length = len(tts_text)
+            tts_tokens = count_tokens(tts_text, model)
+        if caption_tokens is None:
+            caption_tokens = int(caption_length * 0.4)  # Average for mixed content
+        if tts_tokens is None:
+            tts_tokens = int(tts_length * 0.4) if tts_length > 0 else 0
+
+        # Prompt tokens per request, output tokens per variant
+        prompt_tokens = caption_tokens + tts_tokens
+        estimated_output_tokens = int(prompt_tokens * 1.5)  # Estimate output size
+
+        # The first request pays full price, the rest hit the prompt cache
+        uncached_input_tokens = prompt_tokens
+        cached_input_tokens = prompt_tokens * (num_requests - 1)
+        total_output_tokens = estimated_output_tokens * num_variants
+
+        rates = MODEL_PRICING.get(model, DEFAULT_PRICING)
+        input_cost = uncached_input_tokens / 1e6 * rates['input']
+        cached_input_cost = cached_input_tokens / 1e6 * rates['cached_input']
+        output_cost = total_output_tokens / 1e6 * rates['output']
+        total_cost = input_cost + cached_input_cost + output_cost
 
         return {
             'model': model,
             'num_variants': num_variants,
-            'estimated_input_tokens': total_input_tokens * num_variants,
-            'estimated_output_tokens': estimated_output_tokens * num_variants,
+            'num_requests': num_requests,
+            'estimated_input_tokens': uncached_input_tokens + cached_input_tokens,
+            'estimated_uncached_input_tokens': uncached_input_tokens,
+            'estimated_cached_input_tokens': cached_input_tokens,
+            'estimated_output_tokens': total_output_tokens,
+            'estimated_input_cost_usd': round(input_cost, 4),
+            'estimated_cached_input_cost_usd': round(cached_input_cost, 4),
+            'estimated_output_cost_usd': round(output_cost, 4),
             'estimated_cost_usd': round(total_cost, 4),
             'processing_time_estimate': f"{num_variants * 30}-{num_variants * 60}s"
         }
@@ -22,23 +22,38 @@
 #
 
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from config.config import my_config
 from services.audio.audio_service import AudioService
-from tools.utils import must_have_value
+from tools.utils import must_have_value, preprocess_tts_text
 
-try:
-    import azure.cognitiveservices.speech as speechsdk
-except ImportError:
-    print("""
+# Speech SDK模块，第一次创建AzureAudioService时才导入
+speechsdk = None
+
+
+def _sdk():
+    global speechsdk
+    if speechsdk is None:
+        try:
+            import azure.cognitiveservices.speech as sdk
+        except ImportError:
+            print("""
     Importing the Speech SDK for Python failed.
     Refer to
     https://docs.microsoft.com/azure/cognitive-services/speech-service/quickstart-text-to-speech-python for
     installation instructions.
     """)
-    import sys
+            raise
+        speechsdk = sdk
+    return speechsdk
 
-    sys.exit(1)
+
+SSML_TEMPLATE = ('<speak xmlns="http://www.w3.org/2001/10/synthesis" xmlns:mstts="http://www.w3.org/2001/mstts" '
+                 'xmlns:emo="http://www.w3.org/2009/10/emotionml" version="1.0" xml:lang="en-US">'
+                 '<voice name="{voice}"><prosody rate="{rate}%">{text}</prosody></voice></speak>')
 
 
 class AzureAudioService(AudioService):
@@ -51,12 +66,32 @@ class AzureAudioService(AudioService):
         must_have_value(self.audio_provider, "请设置audio provider")
         must_have_value(self.speech_key, "请设置Azure speech_key")
         must_have_value(self.service_region, "请设置Azure speech_key")
+        self._max_retries = 3
+        # SpeechConfig只创建一次，各个合成方法共用
+        self._speech_config = _sdk().SpeechConfig(subscription=self.speech_key, region=self.service_region)
+        # 不绑定输出设备的合成器，多次合成复用，结果再写入各自的文件
+        # 每个线程一个合成器，供save_many_with_ssml并发使用
+        self._local = threading.local()
+        self._local.stream_synthesizer = speechsdk.SpeechSynthesizer(speech_config=self._speech_config,
+                                                                     audio_config=None)
+
+    def _get_stream_synthesizer(self):
+        synthesizer = getattr(self._local, 'stream_synthesizer', None)
+        if synthesizer is None:
+            synthesizer = speechsdk.SpeechSynthesizer(speech_config=self._speech_config, audio_config=None)
+            self._local.stream_synthesizer = synthesizer
+        return synthesizer
+
+    def _voice_speech_config(self, voice):
+        # 指定音色时使用单独的SpeechConfig，不修改共用的_speech_config，避免音色串到其他调用和线程
+        speech_config = speechsdk.SpeechConfig(subscription=self.speech_key, region=self.service_region)
+        speech_config.speech_synthesis_voice_name = voice
+        return speech_config
 
     def my_speech_synthesis_to_wave_file(self, text, file_name, voice="zh-CN-XiaoyiNeural"):
-        speech_config = speechsdk.SpeechConfig(subscription=self.speech_key, region=self.service_region)
+        speech_config = self._voice_speech_config(voice)
         print(file_name)
         file_config = speechsdk.audio.AudioOutputConfig(filename=file_name)
-        speech_config.speech_synthesis_voice_name = voice
         speech_synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=file_config)
 
         # Receives a text from console input and synthesizes it to wave file.
@@ -70,39 +105,43 @@ class AzureAudioService(AudioService):
                 print("Error details: {}".format(cancellation_details.error_details))
 
     def my_speech_synthesis_to_wave_file_ssml(self, text, file_name):
-        speech_config = speechsdk.SpeechConfig(subscription=self.speech_key, region=self.service_region)
+        return self._synthesize_ssml_to_wave_file(text, file_name)[0]
+
+    def _synthesize_ssml_to_wave_file(self, text, file_name):
+        """返回(是否成功, 失败时是否值得重试)"""
         print(file_name)
-        file_config = speechsdk.audio.AudioOutputConfig(filename=file_name)
-        # speech_config.speech_synthesis_voice_name = voice
-        speech_synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=file_config)
 
-        # Receives a text from console input and synthesizes it to wave file.
-        result = speech_synthesizer.speak_ssml_async(text).get()
+        # Synthesizes the ssml in memory and saves the audio to wave file.
+        result = self._get_stream_synthesizer().speak_ssml_async(text).get()
         if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
+            speechsdk.AudioDataStream(result).save_to_wav_file(file_name)
             print("Speech synthesized for text [{}], and the audio was saved to [{}]".format(text, file_name))
-            return True
+            return True, False
         elif result.reason == speechsdk.ResultReason.Canceled:
             cancellation_details = result.cancellation_details
             print("Speech synthesis canceled: {}".format(cancellation_details.reason))
             if cancellation_details.reason == speechsdk.CancellationReason.Error:
                 print("Error details: {}".format(cancellation_details.error_details))
-            return False
+                # 鉴权失败、SSML错误等重试也不会成功
+                if cancellation_details.error_code in (speechsdk.CancellationErrorCode.AuthenticationFailure,
+                                                       speechsdk.CancellationErrorCode.Forbidden,
+                                                       speechsdk.CancellationErrorCode.BadRequest):
+                    return False, False
+            return False, True
         else:
             print("Speech synthesis error: {}".format(result))
-            return False
+            return False, True
 
     def speech_synthesis_with_voice(self, text, voice):
         """performs speech synthesis to the default speaker with specified voice"""
-        # Creates an instance of a speech config with specified subscription key and service region.
-        speech_config = speechsdk.SpeechConfig(subscription=self.speech_key, region=self.service_region)
-        # Sets the synthesis voice name.
+        # Creates a speech config for this call with the synthesis voice name.
         # e.g. "en-US-AndrewMultilingualNeural".
         # The full list of supported voices can be found here:
         # https://aka.ms/csspeech/voicenames
         # And, you can try get_voices_async method to get all available voices.
         # See speech_synthesis_get_available_voices() sample below.
         # voice = "en-US-AndrewMultilingualNeural"
-        speech_config.speech_synthesis_voice_name = voice
+        speech_config = self._voice_speech_config(voice)
         # Creates a speech synthesizer for the specified voice,
         # using the default speaker as audio output.
         speech_synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config)
@@ -119,8 +158,7 @@ class AzureAudioService(AudioService):
                 print("Error details: {}".format(cancellation_details.error_details))
 
     def speech_synthesis_with_voice_ssml(self, ssml):
-        speech_config = speechsdk.SpeechConfig(subscription=self.speech_key, region=self.service_region)
-        speech_synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config)
+        speech_synthesizer = speechsdk.SpeechSynthesizer(speech_config=self._speech_config)
         result = speech_synthesizer.speak_ssml_async(ssml).get()
         # Check result
         if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
@@ -131,36 +169,42 @@ class AzureAudioService(AudioService):
             if cancellation_details.reason == speechsdk.CancellationReason.Error:
                 print("Error details: {}".format(cancellation_details.error_details))
 
-    # save to file
+    # save to file, returns False when no audio was written
     def save_with_ssml(self, text, file_name, voice, rate="0.00"):
-        from tools.utils import preprocess_tts_text
         # Preprocess text to convert punctuation to newlines
         text = preprocess_tts_text(text)
         
-        ssml = f"""
-        <speak xmlns="http://www.w3.org/2001/10/synthesis" xmlns:mstts="http://www.w3.org/2001/mstts" xmlns:emo="http://www.w3.org/2009/10/emotionml" version="1.0" xml:lang="en-US">
-        <voice name="{voice}">
-            <prosody rate="{rate}%">
-                {text}
-            </prosody>
-        </voice>
-        </speak>
-        """
-        result = self.my_speech_synthesis_to_wave_file_ssml(ssml, file_name)
-        # 如果出现异常，重试一次
-        if not result:
-            os.remove(file_name)
-            self.my_speech_synthesis_to_wave_file_ssml(ssml, file_name)
+        ssml = SSML_TEMPLATE.format(voice=voice, rate=rate, text=text)
+        # 合成失败或出现异常时，按指数退避重试
+        last_error = None
+        for attempt in range(self._max_retries):
+            retryable = True
+            try:
+                success, retryable = self._synthesize_ssml_to_wave_file(ssml, file_name)
+                if success:
+                    return True
+                last_error = None
+            except Exception as e:
+                print(f"Speech synthesis attempt {attempt + 1} failed: {e}")
+                last_error = e
+            try:
+                os.remove(file_name)
+            except OSError:
+                pass
+            if not retryable:
+                break
+            if attempt + 1 < self._max_retries:
+                time.sleep(0.2 * 2 ** attempt)
+        if last_error is not None:
+            raise last_error
+        return False
+
+    # save many texts to files concurrently, items are (text, file_name, voice, rate)
+    def save_many_with_ssml(self, items, max_workers=8):
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(lambda item: self.save_with_ssml(*item), items))
 
     def read_with_ssml(self, text, voice, rate="0.00"):
-        ssml = f"""
-        <speak xmlns="http://www.w3.org/2001/10/synthesis" xmlns:mstts="http://www.w3.org/2001/mstts" xmlns:emo="http://www.w3.org/2009/10/emotionml" version="1.0" xml:lang="en-US">
-        <voice name="{voice}">
-            <prosody rate="{rate}%">
-                {text}
-            </prosody>
-        </voice>
-        </speak>
-        """
+        ssml = SSML_TEMPLATE.format(voice=voice, rate=rate, text=text)
         self.speech_synthesis_with_voice_ssml(ssml)
 
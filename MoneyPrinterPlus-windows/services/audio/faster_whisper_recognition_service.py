@@ -21,12 +21,13 @@
 #
 #
 
+import functools
 import os
+import threading
 from typing import List
 
 from config.config import my_config
 from tools.utils import must_have_value
-from faster_whisper import WhisperModel
 
 os.environ["KMP_DUPLICATE_LIB_OK"]="TRUE"
 # 获取当前脚本的绝对路径
@@ -41,35 +42,124 @@ module_output_dir = os.path.join(script_dir, "../../fasterwhisper")
 module_output_dir = os.path.abspath(module_output_dir)
 
 
+# 未设置compute_type时的默认值，int8权重比float16少一半显存和带宽
+DEFAULT_COMPUTE_TYPES = {
+    'cuda': 'int8_float16',
+    'cpu': 'int8',
+}
+
+
+# 已找到的本地模型目录；未找到的结果不缓存，之后下载或复制进来的模型可以被发现
+_local_model_paths = {}
+
+
 def convert_module_to_path(module_name):
+    if module_name in _local_model_paths:
+        return _local_model_paths[module_name]
     # Check if local model exists
     local_path = os.path.join(module_output_dir, module_name)
     
     print(f"Checking for local model at: {local_path}")
-    print(f"Directory exists: {os.path.isdir(local_path)}")
     
-    # If the local path exists and contains model files, use it
-    if os.path.isdir(local_path):
-        # Check if it contains model files (at least model.bin or similar)
-        files_in_dir = os.listdir(local_path) if os.path.exists(local_path) else []
-        print(f"Files in directory: {files_in_dir[:5] if files_in_dir else 'None'}")  # Show first 5 files
-        
-        # Check for model files - FasterWhisper uses .bin files
-        has_model_files = any(f.endswith('.bin') or f == 'config.json' or f == 'model.bin' for f in files_in_dir)
-        
-        if has_model_files:
-            print(f"Using local model from: {local_path}")
-            return local_path
-        else:
-            print(f"Directory exists but no model files found, will download model: {module_name}")
-    else:
+    try:
+        with os.scandir(local_path) as entries:
+            # Check for model files - FasterWhisper uses .bin files
+            for entry in entries:
+                name = entry.name
+                if name.endswith('.bin') or name == 'config.json':
+                    print(f"Using local model from: {local_path}")
+                    _local_model_paths[module_name] = local_path
+                    return local_path
+    except (FileNotFoundError, NotADirectoryError):
         print(f"Local directory not found, will download model: {module_name}")
+        return module_name
     
+    print(f"Directory exists but no model files found, will download model: {module_name}")
     # Otherwise, use the model name directly (for downloading from hub)
     return module_name
 
 
+_model_lock = threading.Lock()
+_loaded_model_key = None
+
+
+# 只保留一个模型，切换模型或compute_type时不会有两个模型同时占用显存
+@functools.lru_cache(maxsize=1)
+def _load_whisper_model(model_name, device_type, compute_type):
+    # faster_whisper导入较慢，只在第一次加载模型时导入
+    from faster_whisper import WhisperModel
+
+    # Get model path or name
+    model_path_or_name = convert_module_to_path(model_name)
+    
+    # convert_module_to_path only returns a different value for a local model directory
+    is_local_path = model_path_or_name != model_name
+    
+    # Load model with configured device (CUDA required)
+    device_to_use = device_type
+    compute_to_use = compute_type
+    
+    try:
+        if is_local_path:
+            # Use local model
+            print(f"Loading local FasterWhisper model from: {model_path_or_name}")
+            model = WhisperModel(model_path_or_name, device=device_to_use, compute_type=compute_to_use,
+                                 local_files_only=True)
+        else:
+            # Download model from hub
+            print(f"Downloading FasterWhisper model: {model_path_or_name}")
+            print(f"This may take a while on first run...")
+            model = WhisperModel(model_path_or_name, device=device_to_use, compute_type=compute_to_use,
+                                 local_files_only=False)
+    except Exception as e:
+        # Check if it's a CUDA library error
+        error_msg = str(e).lower()
+        if "cublas" in error_msg or "cuda" in error_msg or "cudnn" in error_msg:
+            print("="*80)
+            print(f"ERROR: CUDA library not available: {e}")
+            print("="*80)
+            print("CUDA is required for FasterWhisper speech recognition.")
+            print("\nTo fix this issue, you need to install CUDA libraries:")
+            print("1. Install NVIDIA CUDA Toolkit 12.x from:")
+            print("   https://developer.nvidia.com/cuda-downloads")
+            print("2. Or install cuDNN from:")
+            print("   https://developer.nvidia.com/cudnn")
+            print("3. Make sure you have an NVIDIA GPU with CUDA support")
+            print("\nAlternatively, change device_type to 'cpu' in config.yml:")
+            print("  audio:")
+            print("    local_recognition:")
+            print("      fasterwhisper:")
+            print("        device_type: cpu")
+            print("        compute_type: int8")
+            print("="*80)
+            raise RuntimeError(f"CUDA libraries required but not found. Please install CUDA toolkit or change device_type to 'cpu' in config.yml")
+        else:
+            print(f"ERROR: Failed to load FasterWhisper model: {e}")
+            print(f"Model path/name: {model_path_or_name}")
+            print(f"Is local path: {is_local_path}")
+            print(f"Device type: {device_to_use}")
+            print(f"Compute type: {compute_to_use}")
+            raise
+
+    return model
+
+
+def load_whisper_model(model_name, device_type, compute_type):
+    global _loaded_model_key
+    model_key = (model_name, device_type, compute_type)
+    with _model_lock:
+        if _loaded_model_key != model_key:
+            # 先释放旧模型再加载新模型
+            _load_whisper_model.cache_clear()
+            _loaded_model_key = None
+        model = _load_whisper_model(*model_key)
+        _loaded_model_key = model_key
+        return model
+
+
 class FasterWhisperRecognitionResult:
+    __slots__ = ('text', 'begin_time', 'end_time')
+
     def __init__(self, text, begin_time, end_time):
         self.text = text
         self.begin_time = begin_time
@@ -82,82 +172,48 @@ class FasterWhisperRecognitionResult:
 class FasterWhisperRecognitionService:
     def __init__(self):
         super().__init__()
-        self.model_name = my_config['audio'].get('local_recognition', {}).get('fasterwhisper', {}).get('model_name')
-        must_have_value(self.model_name, "请设置语音识别model_name")
-        self.device_type = my_config['audio'].get('local_recognition', {}).get('fasterwhisper', {}).get('device_type')
-        self.compute_type = my_config['audio'].get('local_recognition', {}).get('fasterwhisper', {}).get('compute_type')
-        must_have_value(self.device_type, "请设置语音识别device_type")
-        must_have_value(self.compute_type, "请设置语音识别compute_type")
-
-    def process(self, audioFile, language) -> List[FasterWhisperRecognitionResult]:
-        result_list = []
-
-        # Get model path or name
-        model_path_or_name = convert_module_to_path(self.model_name)
-        
-        # Check if it's a local path or model name
-        is_local_path = os.path.exists(model_path_or_name) and os.path.isdir(model_path_or_name)
-        
-        # Load model with configured device (CUDA required)
-        device_to_use = self.device_type
-        compute_to_use = self.compute_type
-        
-        try:
-            if is_local_path:
-                # Use local model
-                print(f"Loading local FasterWhisper model from: {model_path_or_name}")
-                model = WhisperModel(model_path_or_name, device=device_to_use, compute_type=compute_to_use,
-                                     local_files_only=True)
-            else:
-                # Download model from hub
-                print(f"Downloading FasterWhisper model: {model_path_or_name}")
-                print(f"This may take a while on first run...")
-                model = WhisperModel(model_path_or_name, device=device_to_use, compute_type=compute_to_use,
-                                     local_files_only=False)
-        except Exception as e:
-            # Check if it's a CUDA library error
-            error_msg = str(e).lower()
-            if "cublas" in error_msg or "cuda" in error_msg or "cudnn" in error_msg:
-                print("="*80)
-                print(f"ERROR: CUDA library not available: {e}")
-                print("="*80)
-                print("CUDA is required for FasterWhisper speech recognition.")
-                print("\nTo fix this issue, you need to install CUDA libraries:")
-                print("1. Install NVIDIA CUDA Toolkit 12.x from:")
-                print("   https://developer.nvidia.com/cuda-downloads")
-                print("2. Or install cuDNN from:")
-                print("   https://developer.nvidia.com/cudnn")
-                print("3. Make sure you have an NVIDIA GPU with CUDA support")
-                print("\nAlternatively, change device_type to 'cpu' in config.yml:")
-                print("  audio:")
-                print("    local_recognition:")
-                print("      fasterwhisper:")
-                print("        device_type: cpu")
-                print("        compute_type: int8")
-                print("="*80)
-                raise RuntimeError(f"CUDA libraries required but not found. Please install CUDA toolkit or change device_type to 'cpu' in config.yml")
-            else:
-                print(f"ERROR: Failed to load FasterWhisper model: {e}")
-                print(f"Model path/name: {model_path_or_name}")
-                print(f"Is local path: {is_local_path}")
-                print(f"Device type: {device_to_use}")
-                print(f"Compute type: {compute_to_use}")
-                raise
+        fasterwhisper_config = my_config['audio'].get('local_recognition', {}).get('fasterwhisper', {})
+        self.model_name = fasterwhisper_config.get('model_name')
+        self.device_type = fasterwhisper_config.get('device_type')
+        self.compute_type = fasterwhisper_config.get('compute_type')
+        missing = [key for key in ('model_name', 'device_type') if not fasterwhisper_config.get(key)]
+        must_have_value(not missing, f"请设置语音识别{', '.join(missing)}")
+        if not self.compute_type:
+            # 未设置时按设备选择：GPU用int8_float16，CPU用int8
+            self.compute_type = DEFAULT_COMPUTE_TYPES.get(self.device_type, 'int8')
+        # beam_size=1为贪心解码，速度更快；vad_filter跳过静音片段
+        self.beam_size = fasterwhisper_config.get('beam_size', 5)
+        self.vad_filter = fasterwhisper_config.get('vad_filter', True)
+        self.verbose = fasterwhisper_config.get('verbose', False)
+
+    def _get_model(self):
+        # 模型加载代价很高，按(model, device, compute_type)缓存复用
+        return load_whisper_model(self.model_name, self.device_type, self.compute_type)
+
+    def process(self, audioFile, language, audio_array=None) -> List[FasterWhisperRecognitionResult]:
+        """audio_array: 已解码的16kHz单声道float32音频，传入时不再读取和解码audioFile"""
+        model = self._get_model()
+
+        # 没有传入audio_array时由faster_whisper直接读取文件，解码结果不常驻内存
+        audio_input = audioFile if audio_array is None else audio_array
 
         # or run on GPU with INT8
         # model = WhisperModel(model_size, device="cuda", compute_type="int8_float16")
         # or run on CPU with INT8
         # model = WhisperModel(model_size, device="cpu", compute_type="int8")
 
-        segments, info = model.transcribe(audioFile, beam_size=5)
+        segments, info = model.transcribe(audio_input, beam_size=self.beam_size, vad_filter=self.vad_filter,
+                                          vad_parameters=dict(min_silence_duration_ms=500))
 
         print("Detected language '%s' with probability %f" % (info.language, info.language_probability))
 
-        for segment in segments:
-            print("[%.2fs -> %.2fs] %s" % (segment.start, segment.end, segment.text))
-            result_list.append(
-                FasterWhisperRecognitionResult(segment.text, segment.start,
-                                               segment.end))
+        result_list = [FasterWhisperRecognitionResult(segment.text, segment.start, segment.end)
+                       for segment in segments]
+
+        if self.verbose:
+            for result in result_list:
+                print("[%.2fs -> %.2fs] %s" % (result.begin_time, result.end_time, result.text))
+        print("Recognized %d segments" % len(result_list))
 
         return result_list
 
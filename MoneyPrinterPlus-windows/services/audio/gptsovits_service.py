@@ -21,17 +21,23 @@
 #
 #
 
+import asyncio
+import hashlib
+import logging
 import os
+import secrets
 
 import requests
-from pydub import AudioSegment
-from pydub.playback import play
 
 from config.config import my_config
+from tools.audio_play import play_wav
 from tools.file_utils import save_uploaded_file
-from tools.utils import must_have_value, random_with_system_time
+from tools.tts_cache import get_or_synth, load_cached, save_to_cache
+from tools.utils import must_have_value
 import streamlit as st
 
+logger = logging.getLogger(__name__)
+
 # 获取当前脚本的绝对路径
 script_path = os.path.abspath(__file__)
 
@@ -44,6 +50,17 @@ script_dir = os.path.dirname(script_path)
 audio_output_dir = os.path.join(script_dir, "../../work")
 audio_output_dir = os.path.abspath(audio_output_dir)
 
+# 语速选项对应的speed参数
+audio_speed_map = {
+    "normal": 1.0,
+    "fast": 1.1,
+    "slow": 0.9,
+    "faster": 1.2,
+    "slower": 0.8,
+    "fastest": 1.3,
+    "slowest": 0.7,
+}
+
 
 class GPTSoVITSAudioService:
     def __init__(self):
@@ -51,46 +68,36 @@ class GPTSoVITSAudioService:
         self.service_location = my_config['audio']['local_tts']['GPTSoVITS']['server_location']
         must_have_value(self.service_location, "请设置GPTSoVITS server location")
         self.service_location = self.service_location.rstrip('/') + '?'
+        # 复用HTTP连接
+        self._session = requests.Session()
+        # 本地GPTSoVITS服务受GPU限制，默认只并发2个请求
+        self.max_concurrency = my_config['audio']['local_tts']['GPTSoVITS'].get('max_concurrency', 2)
 
         self.audio_temperature = st.session_state.get('audio_temperature')
         self.audio_top_p = st.session_state.get('audio_top_p')
         self.audio_top_k = int(st.session_state.get('audio_top_k'))
 
-        audio_speed = st.session_state.get("audio_speed")
-        if audio_speed == "normal":
-            self.audio_speed = 1.0
-        if audio_speed == "fast":
-            self.audio_speed = 1.1
-        if audio_speed == "slow":
-            self.audio_speed = 0.9
-        if audio_speed == "faster":
-            self.audio_speed = 1.2
-        if audio_speed == "slower":
-            self.audio_speed = 0.8
-        if audio_speed == "fastest":
-            self.audio_speed = 1.3
-        if audio_speed == "slowest":
-            self.audio_speed = 0.7
+        self.audio_speed = audio_speed_map.get(st.session_state.get("audio_speed"), 1.0)
 
         if st.session_state.get("use_reference_audio"):
             uploaded_file = st.session_state.get("reference_audio")
             if uploaded_file is not None:
-                output_file_name = os.path.join(audio_output_dir, str(random_with_system_time())+uploaded_file.name)
+                output_file_name = os.path.join(audio_output_dir, secrets.token_hex(8)+uploaded_file.name)
                 save_uploaded_file(uploaded_file, output_file_name)
                 self.refer_wav_path=output_file_name
+                # 参考音频文件名每次都不同，缓存key使用音频内容的hash
+                self.refer_wav_hash = hashlib.blake2b(uploaded_file.getvalue(), digest_size=16).hexdigest()
                 self.prompt_text = st.session_state.get("reference_audio_text")
                 self.prompt_language = st.session_state.get("reference_audio_language")
 
         self.text_language = st.session_state.get("inference_audio_language")
 
     def read_with_content(self, content):
-        wav_file = os.path.join(audio_output_dir, str(random_with_system_time()) + ".wav")
+        wav_file = os.path.join(audio_output_dir, secrets.token_hex(8) + ".wav")
         temp_file = self.chat_with_content(content, wav_file)
-        # 读取音频文件
-        audio = AudioSegment.from_file(temp_file)
-        play(audio)
+        play_wav(temp_file)
 
-    def chat_with_content(self, content, audio_output_file):
+    def _build_body(self, content):
         from tools.utils import preprocess_tts_text
         # Preprocess text to convert punctuation to newlines
         content = preprocess_tts_text(content)
@@ -118,19 +125,75 @@ class GPTSoVITSAudioService:
                 "speed": self.audio_speed,
             }
 
-        print(body)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("GPTSoVITS request: %s", body)
+        return body
+
+    def _cache_key(self, body):
+        cache_key = dict(body, provider="GPTSoVITS", server_location=self.service_location)
+        if cache_key.pop("refer_wav_path", None):
+            cache_key["refer_wav_hash"] = self.refer_wav_hash
+        return cache_key
 
+    def chat_with_content(self, content, audio_output_file):
+        body = self._build_body(content)
+        return get_or_synth(self._cache_key(body), lambda path: self._request_audio(body, path), audio_output_file)
+
+    async def chat_with_content_async(self, session, content, audio_output_file):
+        body = self._build_body(content)
+        cache_key = self._cache_key(body)
+        if load_cached(cache_key, audio_output_file):
+            return audio_output_file
+        import aiohttp
+        try:
+            async with session.post(self.service_location, json=body) as response:
+                response.raise_for_status()
+                with open(audio_output_file, 'wb') as file:
+                    async for chunk in response.content.iter_chunked(64 * 1024):
+                        file.write(chunk)
+        except aiohttp.ClientError as e:
+            logger.error("Request Error: %s", e)
+            if os.path.exists(audio_output_file):
+                os.remove(audio_output_file)
+            return None
+        logger.info("文件已保存到 %s", audio_output_file)
+        save_to_cache(cache_key, audio_output_file)
+        return audio_output_file
+
+    async def _synthesize_many_async(self, items, max_concurrency):
+        import aiohttp
+        semaphore = asyncio.Semaphore(max_concurrency)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=5, sock_read=300)
+
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async def synthesize(content, audio_output_file):
+                async with semaphore:
+                    return await self.chat_with_content_async(session, content, audio_output_file)
+
+            return await asyncio.gather(*[synthesize(*item) for item in items])
+
+    def synthesize_many(self, items, max_concurrency=None):
+        """并发合成多段文本，items为(content, audio_output_file)，按顺序返回音频文件路径，失败的段为None"""
+        return asyncio.run(self._synthesize_many_async(items, max_concurrency or self.max_concurrency))
+
+    def _request_audio(self, body, audio_output_file):
+        response = None
         try:
-            response = requests.post(self.service_location, json=body)
+            response = self._session.post(self.service_location, json=body, stream=True, timeout=(5, 300))
             response.raise_for_status()
-            # 读取响应内容
-            content = response.content
-            # 打开一个文件用于写入二进制数据
+            # 分块写入文件，不在内存中缓存整个音频
             with open(audio_output_file, 'wb') as file:
-                file.write(content)  # 将响应内容写入文件
-            print(f"文件已保存到 {audio_output_file}")
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    file.write(chunk)
+            logger.info("文件已保存到 %s", audio_output_file)
             return audio_output_file
 
         except requests.exceptions.RequestException as e:
-            print(f"Request Error: {e}")
+            logger.error("Request Error: %s", e)
+            # 下载中断时删除写了一半的文件
+            if os.path.exists(audio_output_file):
+                os.remove(audio_output_file)
+        finally:
+            if response is not None:
+                response.close()
 
@@ -22,22 +22,25 @@
 #
 
 import base64
-import json
+import logging
 import os
+import random
+import re
+import secrets
+import threading
 import time
 import types
-
-from pydub import AudioSegment
-from pydub.playback import play
-from tencentcloud.common import credential
-from tencentcloud.common.profile.client_profile import ClientProfile
-from tencentcloud.common.profile.http_profile import HttpProfile
-from tencentcloud.tts.v20190823 import tts_client, models
+import wave
+from concurrent.futures import ThreadPoolExecutor
 
 from config.config import my_config
 from services.audio.audio_service import AudioService
+from tools.audio_play import play_wav
 from tools.file_utils import download_file_from_url
-from tools.utils import must_have_value, random_with_system_time
+from tools.tts_cache import get_or_synth
+from tools.utils import must_have_value
+
+logger = logging.getLogger(__name__)
 
 # 获取当前脚本的绝对路径
 script_path = os.path.abspath(__file__)
@@ -50,11 +53,64 @@ script_dir = os.path.dirname(script_path)
 audio_output_dir = os.path.join(script_dir, "../../work")
 audio_output_dir = os.path.abspath(audio_output_dir)
 
+# 删除非英文/非中文字符后剩下的长度就是对应字符数，不用生成匹配列表
+non_english_pattern = re.compile(r'[^a-zA-Z]+')
+non_chinese_pattern = re.compile(r'[^\u4e00-\u9fff]+')
+
+# 从音色名称中提取音色编号
+voice_digits_pattern = re.compile(r'\d+')
+
+
+def count_language_chars(text):
+    return len(non_english_pattern.sub('', text)), len(non_chinese_pattern.sub('', text))
+
+# 每次解码的base64字符数，必须是4的倍数
+BASE64_CHUNK_SIZE = 64 * 1024
+
+
+def write_base64_to_file(data, file_name):
+    # 分块解码写入，避免整段音频解码后同时占用内存
+    with open(file_name, 'wb') as f:
+        for i in range(0, len(data), BASE64_CHUNK_SIZE):
+            f.write(base64.b64decode(data[i:i + BASE64_CHUNK_SIZE]))
+
+# 切分长文本的句子分隔符，preprocess_tts_text之后标点已换成换行
+sentence_pattern = re.compile(r'[^。！？.!?\n]+[。！？.!?\n]*')
+
+
+def split_for_short_api(text, limit=140):
+    """
+    按句子把文本贪心拼成不超过limit的多段，用于短文本接口。
+    有单句超过limit时返回None，交给长文本接口处理。
+    """
+    chunks = []
+    current = ''
+    for sentence in sentence_pattern.findall(text):
+        if len(sentence.strip()) > limit:
+            return None
+        if len(current) + len(sentence) > limit:
+            chunks.append(current.strip())
+            current = ''
+        current += sentence
+    if current.strip():
+        chunks.append(current.strip())
+    return [chunk for chunk in chunks if chunk]
+
+
+def concat_wav_files(input_files, output_file):
+    # 腾讯返回的wav参数相同，直接拼接PCM帧
+    with wave.open(output_file, 'wb') as output:
+        for i, input_file in enumerate(input_files):
+            with wave.open(input_file, 'rb') as wav_input:
+                if i == 0:
+                    output.setparams(wav_input.getparams())
+                output.writeframes(wav_input.readframes(wav_input.getnframes()))
+
 
 class TencentAudioService(AudioService):
     # Valid Tencent voice types based on official documentation
     # https://cloud.tencent.com/document/product/1073/92668
-    VALID_VOICE_TYPES = {
+    VALID_VOICE_TYPES = frozenset({
         # 实时语音合成音色 (Real-time synthesis voices)
         502001, 502003, 502004, 502005, 502006, 502007,  # 超自然大模型音色
         602003,  # 爱小悠
@@ -77,12 +133,12 @@ class TencentAudioService(AudioService):
         1017, 1018, 1050, 1051,
         
         # 基础语音合成音色
-        0, 1, 2, 5, 7, 1000, 1001, 1002, 1003, 1004, 1005, 1007, 1008, 1009,
-        1010, 1015, 1016, 1017, 1018, 1019, 1020, 1021, 1022, 1025, 1026,
-        1027, 1028, 1029, 1030, 1040, 1050, 1051, 1052, 1053, 1054, 1055,
+        # (1001-1005, 1008-1010, 1017, 1018, 1050, 1051 已在标准音色中列出)
+        0, 1, 2, 5, 7, 1000, 1007, 1015, 1016, 1019, 1020, 1021, 1022,
+        1025, 1026, 1027, 1028, 1029, 1030, 1040, 1052, 1053, 1054, 1055,
         1056, 1057, 1058, 1059, 1060, 1061, 1062, 1063, 1064, 1065, 1066,
         1067, 1068, 1069, 1070, 1080, 100510000,
-    }
+    })
     
     def __init__(self):
         super().__init__()
@@ -91,6 +147,29 @@ class TencentAudioService(AudioService):
         must_have_value(self.TENCENT_ACCESS_AKID, "请设置Tencent access key id")
         must_have_value(self.TENCENT_ACCESS_AKKEY, "请设置Tencent access key secret")
         self.endpoint = "tts.tencentcloudapi.com"
+        self.max_concurrency = my_config['audio'].get('Tencent', {}).get('max_concurrency', 4)
+        # 批量合成和长文本分段合成共用，限制同时发往腾讯云的请求总数
+        self._request_slots = threading.BoundedSemaphore(self.max_concurrency)
+
+        # 腾讯云SDK只在真正使用腾讯语音时导入
+        from tencentcloud.common import credential
+        from tencentcloud.common.profile.client_profile import ClientProfile
+        from tencentcloud.common.profile.http_profile import HttpProfile
+        from tencentcloud.tts.v20190823 import models, tts_client
+        self._models = models
+
+        # client在多次合成之间复用
+        cred = credential.Credential(self.TENCENT_ACCESS_AKID, self.TENCENT_ACCESS_AKKEY)
+        # 实例化一个http选项，开启keepAlive复用连接
+        httpProfile = HttpProfile()
+        httpProfile.endpoint = self.endpoint
+        httpProfile.keepAlive = True
+
+        # 实例化一个client选项，可选的，没有特殊需求可以跳过
+        clientProfile = ClientProfile()
+        clientProfile.httpProfile = httpProfile
+        # 实例化要请求产品的client对象,clientProfile是可选的
+        self._client = tts_client.TtsClient(cred, "ap-beijing", clientProfile)
 
     def save_with_ssml(self, text, file_name, voice, rate="0.00"):
         from tools.utils import preprocess_tts_text
@@ -99,90 +178,106 @@ class TencentAudioService(AudioService):
         
         # Validate and convert voice parameter
         try:
-            # If voice is already an integer string, use it directly
-            if isinstance(voice, str) and voice.isdigit():
-                voice_type = int(voice)
             # If voice is an integer, use it directly
-            elif isinstance(voice, int):
+            if isinstance(voice, int):
                 voice_type = voice
+            # If voice is already an integer string, use it directly
+            elif isinstance(voice, str) and voice.isdigit():
+                voice_type = int(voice)
             else:
                 # Try to extract numeric part from voice string
-                import re
-                match = re.search(r'\d+', str(voice))
+                match = voice_digits_pattern.search(str(voice))
                 if match:
                     voice_type = int(match.group())
                 else:
-                    print(f"WARNING: Invalid voice type '{voice}', using default voice 602003")
+                    logger.warning("Invalid voice type '%s', using default voice 602003", voice)
                     voice_type = 602003  # Default to 爱小悠(女)
             
             # Validate that the voice type is supported
             if voice_type not in self.VALID_VOICE_TYPES:
-                print(f"WARNING: Voice type {voice_type} may not be supported by Tencent TTS")
-                print(f"Valid voice types: {sorted(self.VALID_VOICE_TYPES)}")
+                logger.warning("Voice type %s may not be supported by Tencent TTS", voice_type)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Valid voice types: %s", sorted(self.VALID_VOICE_TYPES))
                 # Don't change it, let the API handle the error
                 
         except Exception as e:
-            print(f"ERROR: Failed to parse voice type '{voice}': {e}, using default")
+            logger.error("Failed to parse voice type '%s': %s, using default", voice, e)
             voice_type = 602003  # Default to 爱小悠(女)
         
-        cred = credential.Credential(self.TENCENT_ACCESS_AKID, self.TENCENT_ACCESS_AKKEY)
-        # 实例化一个http选项，可选的，没有特殊需求可以跳过
-        httpProfile = HttpProfile()
-        httpProfile.endpoint = self.endpoint
+        cache_key = {"provider": "Tencent", "text": text, "voice_type": voice_type, "rate": str(rate)}
+        get_or_synth(cache_key, lambda path: self._synthesize(text, path, voice_type, rate), file_name)
 
-        # 实例化一个client选项，可选的，没有特殊需求可以跳过
-        clientProfile = ClientProfile()
-        clientProfile.httpProfile = httpProfile
-        # 实例化要请求产品的client对象,clientProfile是可选的
-        client = tts_client.TtsClient(cred, "ap-beijing", clientProfile)
+    @staticmethod
+    def _fill_request(req, text, voice_type, rate):
+        # 直接给请求对象的字段赋值，不经过json序列化再解析
+        req.Text = text
+        req.SessionId = secrets.token_hex(8)
+        req.Codec = "wav"
+        req.VoiceType = voice_type
+        req.Speed = float(rate)
 
-        # 返回的resp是一个TextToVoiceResponse的实例，与请求对象对应
+    def _synthesize(self, text, file_name, voice_type, rate):
         # Tencent TTS uses 150 characters as the threshold for long text
         # Short text (<150 chars) uses TextToVoice API
         # Long text (>=150 chars) uses CreateTtsTask API
+        # 返回是否合成成功
         if len(text) < 150:
-            # 实例化一个请求对象,每个接口都会对应一个request对象
-            req = models.TextToVoiceRequest()
-            params = {
-                "Text": text,
-                "SessionId": str(random_with_system_time()),
-                "Codec": "wav",
-                "VoiceType": voice_type,
-                "Speed": float(rate)
-
-            }
-            req.from_json_string(json.dumps(params))
+            return self._synthesize_short(text, file_name, voice_type, rate)
+
+        # 能按句子切成多段短文本时，并发调用短文本接口再拼接，省去长文本任务的排队和轮询
+        chunks = split_for_short_api(text)
+        if chunks:
+            return self._synthesize_chunks(chunks, file_name, voice_type, rate)
+        return self._synthesize_long(text, file_name, voice_type, rate)
+
+    def _synthesize_chunks(self, chunks, file_name, voice_type, rate):
+        chunk_files = [f"{file_name}.part{i}.wav" for i in range(len(chunks))]
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                list(executor.map(lambda chunk, chunk_file: self._synthesize_short(chunk, chunk_file, voice_type, rate),
+                                  chunks, chunk_files))
+            concat_wav_files(chunk_files, file_name)
+            return True
+        finally:
+            for chunk_file in chunk_files:
+                try:
+                    os.remove(chunk_file)
+                except OSError:
+                    pass
+
+    def _synthesize_short(self, text, file_name, voice_type, rate):
+        client = self._client
+        models = self._models
+        # 实例化一个请求对象,每个接口都会对应一个request对象
+        req = models.TextToVoiceRequest()
+        self._fill_request(req, text, voice_type, rate)
+        # 返回的resp是一个TextToVoiceResponse的实例，与请求对象对应
+        with self._request_slots:
             try:
                 resp = client.TextToVoice(req)
             except Exception as e:
                 if "VoiceType" in str(e):
-                    print(f"ERROR: Voice type {voice_type} not supported, trying default voice 602003")
-                    params["VoiceType"] = 602003
-                    req.from_json_string(json.dumps(params))
+                    logger.error("Voice type %s not supported, trying default voice 602003", voice_type)
+                    req.VoiceType = 602003
                     resp = client.TextToVoice(req)
                 else:
                     raise
-            # 输出json格式的字符串回包
-            # print(resp.to_json_string())
-            # 使用base64库解码字符串
-            decoded_audio_data = base64.b64decode(resp.Audio)
-            # 写入WAV文件
-            print("腾讯语音合成任务成功")
-            with open(file_name, 'wb') as wav_file:
-                wav_file.write(decoded_audio_data)
-        else:
-            # 使用腾讯长文本语音合成
-            # 实例化一个请求对象,每个接口都会对应一个request对象
-            req = models.CreateTtsTaskRequest()
-            params = {
-                "Text": text,
-                "SessionId": str(random_with_system_time()),
-                "Codec": "wav",
-                "VoiceType": voice_type,
-                "Speed": float(rate)
-            }
-            req.from_json_string(json.dumps(params))
-            # 返回的resp是一个CreateTtsTaskResponse的实例，与请求对象对应
+        # 输出json格式的字符串回包
+        # print(resp.to_json_string())
+        # 分块解码base64并写入WAV文件
+        logger.info("腾讯语音合成任务成功")
+        write_base64_to_file(resp.Audio, file_name)
+        return True
+
+    def _synthesize_long(self, text, file_name, voice_type, rate):
+        client = self._client
+        models = self._models
+        # 使用腾讯长文本语音合成
+        # 实例化一个请求对象,每个接口都会对应一个request对象
+        req = models.CreateTtsTaskRequest()
+        self._fill_request(req, text, voice_type, rate)
+        # 返回的resp是一个CreateTtsTaskResponse的实例，与请求对象对应
+        with self._request_slots:
             try:
                 resp = client.CreateTtsTask(req)
             except Exception as e:
@@ -190,70 +285,80 @@ class TencentAudioService(AudioService):
                     # For long text, we need a voice that supports long text synthesis
                     # 602003 (爱小悠) doesn't support long text API (>150 chars)
                     # We need to choose a fallback voice based on content
-                    
-                    import re
+                
                     # Count language characters
-                    english_chars = len(re.findall(r'[a-zA-Z]', text))
-                    chinese_chars = len(re.findall(r'[\u4e00-\u9fff]', text))
+                    english_chars, chinese_chars = count_language_chars(text)
                     total_chars = len(text)
-                    
+                
                     # Calculate language ratios
                     english_ratio = (english_chars / total_chars) if total_chars > 0 else 0
                     chinese_ratio = (chinese_chars / total_chars) if total_chars > 0 else 0
-                    
-                    print(f"Text analysis: Length={len(text)}, English={english_ratio:.1%}, Chinese={chinese_ratio:.1%}")
-                    
+                
+                    logger.info("Text analysis: Length=%d, English=%.1f%%, Chinese=%.1f%%", len(text), english_ratio * 100, chinese_ratio * 100)
+                
                     # Choose fallback voice based on content
                     # 501001 (智兰) is the best alternative that supports both Chinese and English
                     # Only use English-specific voices if text is >70% English
                     if english_ratio > 0.7 and chinese_ratio < 0.1:
                         # Mostly pure English, use English voice
-                        print(f"Voice {voice_type} not supported for long text. Using 501008 (WeJames) for English content")
-                        params["VoiceType"] = 501008
+                        logger.warning("Voice %s not supported for long text. Using 501008 (WeJames) for English content", voice_type)
+                        req.VoiceType = 501008
                     else:
                         # Chinese, mixed content, or moderate English - use 501001 which handles both well
-                        print(f"Voice {voice_type} not supported for long text (>150 chars).")
-                        print(f"Using voice 501001 (智兰) - supports both Chinese and English")
-                        params["VoiceType"] = 501001
-                    req.from_json_string(json.dumps(params))
+                        logger.warning("Voice %s not supported for long text (>150 chars). "
+                                       "Using voice 501001 (智兰) - supports both Chinese and English", voice_type)
+                        req.VoiceType = 501001
                     resp = client.CreateTtsTask(req)
                 else:
                     raise
+        # 输出json格式的字符串回包
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(resp.to_json_string())
+        long_tts_request_id = resp.RequestId
+        long_tts_request_task = resp.Data.TaskId
+        # 查询结果，轮询间隔从250ms开始指数增长，最长10秒
+        delay = 0.25
+        last_status = None
+        # 查询请求每次都相同，只创建一次
+        status_req = models.DescribeTtsTaskStatusRequest()
+        status_req.TaskId = long_tts_request_task
+        while True:
+            # 返回的resp是一个DescribeTtsTaskStatusResponse的实例，与请求对象对应
+            with self._request_slots:
+                resp = client.DescribeTtsTaskStatus(status_req)
             # 输出json格式的字符串回包
-            print(resp.to_json_string())
-            long_tts_request_id = resp.RequestId
-            long_tts_request_task = resp.Data.TaskId
-            time.sleep(2)
-            # 查询结果
-            while True:
-                # 实例化一个请求对象,每个接口都会对应一个request对象
-                req = models.DescribeTtsTaskStatusRequest()
-                params = {
-                    "TaskId": long_tts_request_task
-                }
-                req.from_json_string(json.dumps(params))
-                # 返回的resp是一个DescribeTtsTaskStatusResponse的实例，与请求对象对应
-                resp = client.DescribeTtsTaskStatus(req)
-                # 输出json格式的字符串回包
-                # print(resp.to_json_string())
-                # Status: 任务状态码，0：任务等待，1：任务执行中，2：任务成功，3：任务失败。
-                if resp.Data.Status == 0:
-                    print("腾讯语音合成任务等待中...")
-                    time.sleep(2)
-                    continue
-                elif resp.Data.Status == 1:
-                    print("腾讯语音合成任务执行中...")
-                    time.sleep(2)
-                    continue
-                elif resp.Data.Status == 2:
-                    print("腾讯语音合成任务成功")
-                    result_url = resp.Data.ResultUrl
-                    if result_url:
-                        download_file_from_url(result_url, file_name)
-                    break
-                elif resp.Data.Status == 3:
-                    print("腾讯语音合成任务失败")
-                    break
+            # print(resp.to_json_string())
+            # Status: 任务状态码，0：任务等待，1：任务执行中，2：任务成功，3：任务失败。
+            status = resp.Data.Status
+            if status == 2:
+                logger.info("腾讯语音合成任务成功")
+                result_url = resp.Data.ResultUrl
+                return bool(result_url) and download_file_from_url(result_url, file_name)
+            elif status == 3:
+                logger.error("腾讯语音合成任务失败")
+                return False
+            elif status == 0:
+                logger.info("腾讯语音合成任务等待中...")
+            elif status == 1:
+                logger.info("腾讯语音合成任务执行中...")
+                if last_status == 0:
+                    # 任务刚开始执行，重新从较短的间隔开始轮询
+                    delay = 0.25
+            last_status = status
+            time.sleep(delay + random.uniform(0, 0.05))
+            delay = min(delay * 1.7, 10.0)
+
+    def synthesize_many(self, items, max_concurrency=None):
+        """
+        并发合成多段文本，items为(text, file_name, voice, rate)，按顺序返回文件路径。
+        长文本内部的分段请求同样占用_request_slots，总并发不超过max_concurrency。
+        """
+        def synthesize(item):
+            self.save_with_ssml(*item)
+            return item[1]
+
+        with ThreadPoolExecutor(max_workers=max_concurrency or self.max_concurrency) as executor:
+            return list(executor.map(synthesize, items))
 
     def read_with_ssml(self, text, voice, rate="0.00"):
         temp_file = os.path.join(audio_output_dir, "temp.wav")
@@ -261,16 +366,12 @@ class TencentAudioService(AudioService):
             self.save_with_ssml(text, temp_file, voice, rate)
             # Check if file was created successfully
             if not os.path.exists(temp_file):
-                print("ERROR: Audio file was not created")
+                logger.error("Audio file was not created")
                 return
-            # 读取音频文件
-            audio = AudioSegment.from_file(temp_file)
-            # 剪辑音频（例如，剪辑前5秒）
-            # audio_snippet = audio[:5000]
-            # 播放剪辑后的音频
-            play(audio)
+            # 播放音频文件
+            play_wav(temp_file)
         except Exception as e:
-            print(f"ERROR in read_with_ssml: {e}")
+            logger.error("Error in read_with_ssml: %s", e)
             import streamlit as st
             st.error(f"腾讯语音测试失败: {str(e)}")
 
@@ -24,6 +24,8 @@
 import json
 import os
 import platform
+import re
+import textwrap
 from typing import Optional
 
 from config.config import my_config
@@ -54,6 +56,9 @@ if platform.system() == "Windows":
     font_dir = font_dir.replace("\\", "\\\\\\\\")
     font_dir = font_dir.replace(":", "\\\\:")
 
+# 按中英文标点切分字幕句子
+_SENT_SPLIT_RE = re.compile(r'[.!?。！？,，;；:：]+')
+
 
 def generate_caption_from_tts_text():
     """Generate subtitles directly from TTS text"""
@@ -112,8 +117,6 @@ def generate_caption_from_tts_text():
 
 def generate_srt_from_text(text, duration, output_file):
     """Generate SRT subtitle file from text with smart text splitting"""
-    import re
-    
     def format_time_srt(seconds):
         """Format time for SRT subtitle format (HH:MM:SS,mmm)"""
         hours = int(seconds // 3600)
@@ -124,7 +127,7 @@ def generate_srt_from_text(text, duration, output_file):
     
     # Split text into sentences or chunks for better subtitle display
     # Split by punctuation marks including commas for more natural breaks
-    sentences = re.split(r'[.!?。！？,，;；:：]+', text)
+    sentences = _SENT_SPLIT_RE.split(text)
     sentences = [s.strip() for s in sentences if s.strip()]
     
     # If no sentences after splitting, use the whole text
@@ -136,21 +139,9 @@ def generate_srt_from_text(text, duration, output_file):
     final_sentences = []
     for sentence in sentences:
         if len(sentence) > max_chars_per_subtitle:
-            # Split by spaces into chunks
-            words = sentence.split()
-            current_chunk = []
-            current_length = 0
-            for word in words:
-                if current_length + len(word) + 1 <= max_chars_per_subtitle:
-                    current_chunk.append(word)
-                    current_length += len(word) + 1
-                else:
-                    if current_chunk:
-                        final_sentences.append(' '.join(current_chunk))
-                    current_chunk = [word]
-                    current_length = len(word)
-            if current_chunk:
-                final_sentences.append(' '.join(current_chunk))
+            # Split by spaces into chunks, keeping unspaced (e.g. Chinese) text whole
+            final_sentences.extend(textwrap.wrap(sentence, max_chars_per_subtitle,
+                                                 break_long_words=False, break_on_hyphens=False))
         else:
             final_sentences.append(sentence)
     
@@ -178,19 +169,10 @@ def generate_srt_from_text(text, duration, output_file):
             
             # Subtitle text (split into multiple lines if needed)
             if len(sentence) > 45:  # Split long lines for better readability
-                words = sentence.split()
-                lines = []
-                current_line = []
-                for word in words:
-                    current_line.append(word)
-                    if len(' '.join(current_line)) > 40:
-                        if len(lines) < 2:  # Max 2 lines per subtitle
-                            lines.append(' '.join(current_line[:-1]))
-                            current_line = [word]
-                        else:
-                            break
-                if current_line and len(lines) < 2:
-                    lines.append(' '.join(current_line))
+                lines = textwrap.wrap(sentence, width=40, break_long_words=False, break_on_hyphens=False)
+                # Max 2 lines per subtitle, the rest of the text stays on the second line
+                if len(lines) > 2:
+                    lines = [lines[0], ' '.join(lines[1:])]
                 f.write('\n'.join(lines) + '\n')
             else:
                 f.write(sentence + '\n')
@@ -169,36 +169,37 @@ def get_audio_and_video_list(audio_service, audio_rate):
     for scene_segments in video_scene_text_list:
         if scene_segments:  # If scene has text segments
             scene_audio_files = []  # Audio files for this scene
+            segment_items = [(segment_text,
+                              os.path.join(audio_output_dir, f"{random_with_system_time()}_{scene_idx}_{segment_idx}.wav"),
+                              audio_voice,
+                              audio_rate)
+                             for segment_idx, segment_text in enumerate(scene_segments) if segment_text]
             
-            # Generate audio for each segment in the scene
-            for segment_idx, segment_text in enumerate(scene_segments):
-                if segment_text:
-                    temp_file_name = f"{random_with_system_time()}_{scene_idx}_{segment_idx}"
-                    audio_output_file = os.path.join(audio_output_dir, f"{temp_file_name}.wav")
-                    
-                    # Try to generate audio
-                    try:
-                        print(f"  Generating audio for scene {scene_idx+1}, segment {segment_idx+1}/{len(scene_segments)}: {segment_text[:50]}...")
-                        audio_service.save_with_ssml(segment_text,
-                                                     audio_output_file,
-                                                     audio_voice,
-                                                     audio_rate)
-                    except Exception as e:
-                        st.error(f"音频生成失败: {str(e)}", icon="❌")
-                        st.stop()
-                    
-                    # Check if audio file was actually created
-                    if not os.path.exists(audio_output_file):
-                        st.error(f"音频文件生成失败，可能是TTS服务问题（免费试用过期或配额用尽）", icon="❌")
-                        st.info("请检查您的TTS服务配置或更换其他TTS服务提供商")
-                        st.stop()
-                    
-                    # Check if audio file has content
-                    if os.path.getsize(audio_output_file) == 0:
-                        st.error(f"音频文件为空，TTS服务可能未正确生成内容", icon="❌")
-                        st.stop()
-                    
-                    scene_audio_files.append(audio_output_file)
+            # Generate audio for all segments in the scene, concurrently when the service supports it
+            try:
+                print(f"  Generating audio for scene {scene_idx+1}: {len(segment_items)} segments")
+                if hasattr(audio_service, 'synthesize_many'):
+                    audio_service.synthesize_many(segment_items)
+                else:
+                    for segment_item in segment_items:
+                        audio_service.save_with_ssml(*segment_item)
+            except Exception as e:
+                st.error(f"音频生成失败: {str(e)}", icon="❌")
+                st.stop()
+            
+            for _, audio_output_file, _, _ in segment_items:
+                # Check if audio file was actually created
+                if not os.path.exists(audio_output_file):
+                    st.error(f"音频文件生成失败，可能是TTS服务问题（免费试用过期或配额用尽）", icon="❌")
+                    st.info("请检查您的TTS服务配置或更换其他TTS服务提供商")
+                    st.stop()
+                
+                # Check if audio file has content
+                if os.path.getsize(audio_output_file) == 0:
+                    st.error(f"音频文件为空，TTS服务可能未正确生成内容", icon="❌")
+                    st.stop()
+                
+                scene_audio_files.append(audio_output_file)
             
             # Concatenate all segments for this scene into one audio file
             if len(scene_audio_files) > 1:
@@ -247,32 +248,34 @@ def get_audio_and_video_list_local(audio_service):
     for scene_segments in video_scene_text_list:
         if scene_segments:  # If scene has text segments
             scene_audio_files = []  # Audio files for this scene
+            segment_items = [(segment_text,
+                              os.path.join(audio_output_dir, f"{random_with_system_time()}_{scene_idx}_{segment_idx}.wav"))
+                             for segment_idx, segment_text in enumerate(scene_segments) if segment_text]
             
-            # Generate audio for each segment in the scene
-            for segment_idx, segment_text in enumerate(scene_segments):
-                if segment_text:
-                    temp_file_name = f"{random_with_system_time()}_{scene_idx}_{segment_idx}"
-                    audio_output_file = os.path.join(audio_output_dir, f"{temp_file_name}.wav")
-                    
-                    # Try to generate audio
-                    try:
-                        print(f"  Generating local audio for scene {scene_idx+1}, segment {segment_idx+1}/{len(scene_segments)}: {segment_text[:50]}...")
-                        audio_service.chat_with_content(segment_text, audio_output_file)
-                    except Exception as e:
-                        st.error(f"本地音频生成失败: {str(e)}", icon="❌")
-                        st.stop()
-                    
-                    # Check if audio file was actually created
-                    if not os.path.exists(audio_output_file):
-                        st.error(f"音频文件生成失败，请检查本地TTS服务是否正常运行", icon="❌")
-                        st.stop()
-                    
-                    # Check if audio file has content
-                    if os.path.getsize(audio_output_file) == 0:
-                        st.error(f"音频文件为空，本地TTS服务可能未正确生成内容", icon="❌")
-                        st.stop()
-                    
-                    scene_audio_files.append(audio_output_file)
+            # Generate audio for all segments in the scene, concurrently when the service supports it
+            try:
+                print(f"  Generating local audio for scene {scene_idx+1}: {len(segment_items)} segments")
+                if hasattr(audio_service, 'synthesize_many'):
+                    audio_service.synthesize_many(segment_items)
+                else:
+                    for segment_item in segment_items:
+                        audio_service.chat_with_content(*segment_item)
+            except Exception as e:
+                st.error(f"本地音频生成失败: {str(e)}", icon="❌")
+                st.stop()
+            
+            for _, audio_output_file in segment_items:
+                # Check if audio file was actually created
+                if not os.path.exists(audio_output_file):
+                    st.error(f"音频文件生成失败，请检查本地TTS服务是否正常运行", icon="❌")
+                    st.stop()
+                
+                # Check if audio file has content
+                if os.path.getsize(audio_output_file) == 0:
+                    st.error(f"音频文件为空，本地TTS服务可能未正确生成内容", icon="❌")
+                    st.stop()
+                
+                scene_audio_files.append(audio_output_file)
             
             # Concatenate all segments for this scene into one audio file
             if len(scene_audio_files) > 1:
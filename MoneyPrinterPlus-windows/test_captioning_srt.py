@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test script for subtitle generation from TTS text
+Checks that generate_srt_from_text never drops text when splitting and wrapping
+"""
+
+import os
+import tempfile
+
+
+def _srt_text(text, duration=30):
+    from services.captioning.captioning_service import generate_srt_from_text
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        srt_file = os.path.join(tmpdir, "test.srt")
+        generate_srt_from_text(text, duration, srt_file)
+        with open(srt_file, encoding='utf-8') as f:
+            blocks = f.read().strip().split('\n\n')
+    # 去掉序号和时间轴, 只保留字幕文字行
+    return [block.split('\n')[2:] for block in blocks]
+
+
+def test_long_cjk_run_is_kept():
+    cjk_run = "中" * 50
+    subtitles = _srt_text("Hello there " + cjk_run)
+    assert subtitles == [["Hello there", cjk_run]]
+
+
+def test_long_word_is_kept():
+    long_word = "b" * 45
+    subtitles = _srt_text("a" * 10 + " " + long_word + " c")
+    assert subtitles == [["a" * 10, long_word + " c"]]
+
+
+def test_long_sentence_is_chunked():
+    subtitles = _srt_text("word " * 40)
+    assert all(len(lines) <= 2 for lines in subtitles)
+    assert ' '.join(' '.join(lines) for lines in subtitles).split() == ["word"] * 40
+
+
+def main():
+    test_long_cjk_run_is_kept()
+    test_long_word_is_kept()
+    test_long_sentence_is_chunked()
+    print("✅ Subtitle generation tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+﻿#  Copyright © [2024] Wenrui Yu
+#
+#  All rights reserved. This software and associated documentation files (the "Software") are provided for personal and educational use only. Commercial use of the Software is strictly prohibited unless explicit permission is obtained from the author.
+#
+#  Permission is hereby granted to any person to use, copy, and modify the Software for non-commercial purposes, provided that the following conditions are met:
+#
+#  1. The original copyright notice and this permission notice must be included in all copies or substantial portions of the Software.
+#  2. Modifications, if any, must retain the original copyright information and must not imply that the modified version is an official version of the Software.
+#  3. Any distribution of the Software or its modifications must retain the original copyright notice and include this permission notice.
+#
+#  For commercial use, including but not limited to selling, distributing, or using the Software as part of any commercial product or service, you must obtain explicit authorization from the author.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHOR OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+#  Author: Wenrui Yu
+#  email: flydean@163.com
+#  Website: [www.flydean.com](http://www.flydean.com)
+#  GitHub: [https://github.com/ddean2009/MoneyPrinterPlus](https://github.com/ddean2009/MoneyPrinterPlus)
+#
+#  All rights reserved.
+#
+#
+
+import os
+
+
+def play_wav(path):
+    """
+    直接播放wav的PCM数据，不经过pydub/ffplay和临时文件。
+    没有安装soundfile/sounddevice或PortAudio，或者不是wav文件时退回pydub播放。
+    """
+    if os.path.splitext(path)[1].lower() == '.wav':
+        try:
+            import sounddevice
+            import soundfile
+        except (ImportError, OSError):
+            # 缺少PortAudio库时import sounddevice会抛出OSError
+            pass
+        else:
+            stream_play(path)
+            return
+
+    from pydub import AudioSegment
+    from pydub.playback import play
+    play(AudioSegment.from_file(path))
+
+
+def stream_play(path, blocksize=4096):
+    # 按块读取并写入输出流，长音频也不需要整段读入内存
+    import sounddevice
+    import soundfile
+    with soundfile.SoundFile(path) as f:
+        with sounddevice.RawOutputStream(samplerate=f.samplerate, channels=f.channels, dtype='int16') as out:
+            for block in f.blocks(blocksize=blocksize, dtype='int16'):
+                out.write(block)
@@ -119,7 +119,7 @@ def download_file_from_url(url, output_path):
     output_path (str): 保存文件的本地路径。
 
     返回:
-    None
+    bool: 下载成功时为True。
     """
     try:
         # 发送GET请求到URL
@@ -134,11 +134,13 @@ def download_file_from_url(url, output_path):
                     # 写入文件
                     file.write(chunk)
             print(f"文件已成功下载到 {output_path}")
+            return True
         else:
             print(f"请求失败，状态码: {response.status_code}")
 
     except requests.exceptions.RequestException as e:
         print(f"发生了一个错误: {e}")
+    return False
 
 
 def get_random_text_file_from_directory(directory_path):
@@ -22,6 +22,7 @@
 #
 
 # 加载JSON翻译文件
+import functools
 import json
 import os
 
@@ -38,7 +39,8 @@ LANG = 'zh-CN'
 default_file_path = os.path.join(script_dir, "../locales", 'zh-CN.json')
 
 
-# 加载翻译文件
+# 加载翻译文件, 每种语言只读取一次
+@functools.lru_cache(maxsize=None)
 def load_translations(lang):
     file_path = os.path.join(script_dir, "../locales", f'{lang}.json')
     if os.path.exists(file_path):
@@ -49,7 +51,8 @@ def load_translations(lang):
             return json.load(file)
 
 
-# 获取翻译
+# 获取翻译, 页面每次重跑都会用相同的文本调用, 结果直接缓存
+@functools.lru_cache(maxsize=4096)
 def tr(key, lang=LANG):
     translations = load_translations(lang)
     return translations.get(key, key)  # 如果找不到翻译，就返回原字符串
@@ -0,0 +1,157 @@
+﻿#  Copyright © [2024] Wenrui Yu
+#
+#  All rights reserved. This software and associated documentation files (the "Software") are provided for personal and educational use only. Commercial use of the Software is strictly prohibited unless explicit permission is obtained from the author.
+#
+#  Permission is hereby granted to any person to use, copy, and modify the Software for non-commercial purposes, provided that the following conditions are met:
+#
+#  1. The original copyright notice and this permission notice must be included in all copies or substantial portions of the Software.
+#  2. Modifications, if any, must retain the original copyright information and must not imply that the modified version is an official version of the Software.
+#  3. Any distribution of the Software or its modifications must retain the original copyright notice and include this permission notice.
+#
+#  For commercial use, including but not limited to selling, distributing, or using the Software as part of any commercial product or service, you must obtain explicit authorization from the author.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHOR OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+#  Author: Wenrui Yu
+#  email: flydean@163.com
+#  Website: [www.flydean.com](http://www.flydean.com)
+#  GitHub: [https://github.com/ddean2009/MoneyPrinterPlus](https://github.com/ddean2009/MoneyPrinterPlus)
+#
+#  All rights reserved.
+#
+#
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 获取当前脚本的绝对路径
+script_path = os.path.abspath(__file__)
+
+# 脚本所在的目录
+script_dir = os.path.dirname(script_path)
+
+# TTS缓存目录，按请求参数的hash保存合成好的wav
+tts_cache_dir = os.path.join(script_dir, "../work/tts_cache")
+tts_cache_dir = os.path.abspath(tts_cache_dir)
+
+# 缓存默认保留7天
+DEFAULT_TTL = 7 * 24 * 3600
+PRUNE_INTERVAL = 3600
+
+_pruner_lock = threading.Lock()
+_pruner_started = False
+
+
+def tts_cache_key(key_dict):
+    data = json.dumps(key_dict, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(data.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _cache_path(key_dict):
+    return os.path.join(tts_cache_dir, tts_cache_key(key_dict) + ".wav")
+
+
+def load_cached(key_dict, out_path):
+    """命中缓存时把缓存的wav复制到out_path并返回True"""
+    _start_pruner()
+    cache_path = _cache_path(key_dict)
+    try:
+        if os.path.getsize(cache_path) > 0:
+            shutil.copyfile(cache_path, out_path)
+            logger.info("TTS缓存命中: %s", cache_path)
+            return True
+    except OSError:
+        pass
+    return False
+
+
+def save_to_cache(key_dict, out_path, ttl=DEFAULT_TTL):
+    """把合成成功的out_path写入缓存"""
+    try:
+        if os.path.getsize(out_path) > 0:
+            _store(out_path, _cache_path(key_dict), ttl)
+    except OSError:
+        pass
+
+
+def get_or_synth(key_dict, synth_fn, out_path, ttl=DEFAULT_TTL):
+    """
+    相同参数的TTS请求直接复制缓存的wav，否则调用synth_fn(out_path)合成并写入缓存。
+    synth_fn合成成功时返回真值，只有成功的结果才会写入缓存。
+    返回out_path，合成失败时返回synth_fn的结果。
+    """
+    if load_cached(key_dict, out_path):
+        return out_path
+    # 先删除旧文件，避免合成失败时把上一次留下的音频写入缓存
+    try:
+        os.remove(out_path)
+    except FileNotFoundError:
+        pass
+    result = synth_fn(out_path)
+    if result:
+        save_to_cache(key_dict, out_path, ttl)
+    return result
+
+
+def _store(out_path, cache_path, ttl):
+    os.makedirs(tts_cache_dir, exist_ok=True)
+    # 先写临时文件再替换，避免并发时读到写了一半的缓存
+    temp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        shutil.copyfile(out_path, temp_path)
+        os.replace(temp_path, cache_path)
+        with open(cache_path[:-4] + ".json", 'w', encoding='utf-8') as f:
+            json.dump({"createdAt": time.time(), "ttl": ttl}, f)
+    except OSError as e:
+        logger.warning("TTS缓存写入失败: %s", e)
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def prune_tts_cache(now=None):
+    """删除超过ttl的缓存文件"""
+    now = now or time.time()
+    try:
+        entries = list(os.scandir(tts_cache_dir))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if not entry.name.endswith(".json"):
+            continue
+        try:
+            with open(entry.path, encoding='utf-8') as f:
+                meta = json.load(f)
+            expired = meta.get("createdAt", 0) + meta.get("ttl", DEFAULT_TTL) < now
+        except (OSError, ValueError):
+            expired = True
+        if expired:
+            for path in (entry.path[:-5] + ".wav", entry.path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def _prune_loop():
+    while True:
+        prune_tts_cache()
+        time.sleep(PRUNE_INTERVAL)
+
+
+def _start_pruner():
+    global _pruner_started
+    if _pruner_started:
+        return
+    with _pruner_lock:
+        if not _pruner_started:
+            threading.Thread(target=_prune_loop, name="tts-cache-pruner", daemon=True).start()
+            _pruner_started = True
@@ -21,6 +21,7 @@
 #
 #
 
+import functools
 import os
 import random
 import subprocess
@@ -45,7 +46,19 @@ def preprocess_tts_text(text):
     """
     if not text:
         return text
-    
+    # Segments are often synthesized again on retries and re-renders; only
+    # cache reasonably short texts
+    if isinstance(text, str) and len(text) < 8192:
+        return _preprocess_tts_text_cached(text)
+    return _preprocess_tts_text(text)
+
+
+@functools.lru_cache(maxsize=4096)
+def _preprocess_tts_text_cached(text):
+    return _preprocess_tts_text(text)
+
+
+def _preprocess_tts_text(text):
     # Define all common punctuation marks including Chinese and English punctuation
     # Using a single string to avoid any spacing issues
     punctuation_marks = (
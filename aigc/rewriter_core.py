@@ -14,6 +14,7 @@ import subprocess
 import sys
 import shlex
 import os
+import threading
 
 __all__ = ["RewriterConfig", "Rewriter"]
 
@@ -118,6 +119,8 @@ class Rewriter:
 
     def _build_env(self) -> dict:
         env = os.environ.copy()
+        # Make the child flush every line so callbacks see output as it is produced
+        env["PYTHONUNBUFFERED"] = "1"
         if self.cfg.api_key:
             env["DEEPSEEK_API_KEY"] = self.cfg.api_key
         return env
@@ -148,14 +151,22 @@ class Rewriter:
         )
 
         assert self._proc.stdout and self._proc.stderr
-        for line in self._proc.stdout:
+        # Drain stderr on its own thread so neither pipe can fill up and block
+        # the child while the other one is being read.
+        err_accum = []
+
+        def pump_stderr(stream):
+            for line in iter(stream.readline, ""):
+                err_accum.append(line)
+                if on_stderr:
+                    on_stderr(line)
+
+        err_thread = threading.Thread(target=pump_stderr, args=(self._proc.stderr,), daemon=True)
+        err_thread.start()
+        for line in iter(self._proc.stdout.readline, ""):
             if on_stdout:
                 on_stdout(line)
-        err_accum = []
-        for line in self._proc.stderr:
-            err_accum.append(line)
-            if on_stderr:
-                on_stderr(line)
+        err_thread.join()
 
         code = self._proc.wait()
         self._proc = None